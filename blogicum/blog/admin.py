@@ -1,6 +1,28 @@
 from django.contrib import admin
-from django.utils import timezone
-from .models import Category, Comment, Location, Post
+from django.db.models import Q
+from django.db.models.functions import Now
+
+from .models import Category, Comment, ImageTask, Location, Post
+from .pagination import CachedCountPaginator
+from .search import filter_matching
+
+
+class EstimatedCountAdmin(admin.ModelAdmin):
+    """Список с ограниченным подсчётом строк для больших таблиц.
+
+    Строки считаются не дальше POSTS_COUNT_LIMIT, а полный COUNT(*)
+    без фильтров не выполняется вовсе.
+    """
+
+    list_per_page = 100
+    show_full_result_count = False
+
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        return CachedCountPaginator(
+            queryset, per_page, orphans=orphans,
+            allow_empty_first_page=allow_empty_first_page
+        )
 
 
 @admin.register(Category)
@@ -16,19 +38,20 @@ class CategoryAdmin(admin.ModelAdmin):
 
 
 @admin.register(Location)
-class LocationAdmin(admin.ModelAdmin):
+class LocationAdmin(EstimatedCountAdmin):
     list_display = (
         'name',
         'is_published',
         'created_at',
     )
     list_editable = ('is_published',)
-    search_fields = ('name',)
+    # Поиск по началу названия идёт по индексу location_name_nocase_idx.
+    search_fields = ('^name',)
     list_filter = ('is_published', 'created_at')
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(EstimatedCountAdmin):
     list_display = (
         'title',
         'author',
@@ -40,26 +63,67 @@ class PostAdmin(admin.ModelAdmin):
         'created_at',
     )
     list_editable = ('is_published',)
+    list_select_related = ('author', 'category', 'location')
+    # Пользователей слишком много для выпадающего списка: автор
+    # задаётся по id, а место — через автодополнение по индексу.
+    raw_id_fields = ('author',)
+    autocomplete_fields = ('location',)
     search_fields = ('title', 'text')
     list_filter = ('is_published', 'category', 'location', 'pub_date')
     date_hierarchy = 'pub_date'
-    
-    @admin.display(boolean=True, description='Виден для пользователя')
-    def is_visible(self, obj):
-        return (
-            obj.is_published 
-            and obj.pub_date <= timezone.now()
-            and (obj.category is None or obj.category.is_published)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            visible_now=Q(visible_from__lte=Now())
         )
 
+    @admin.display(
+        boolean=True,
+        description='Виден для пользователя',
+        ordering='visible_from'
+    )
+    def is_visible(self, obj):
+        return obj.visible_now
+
+    def get_search_results(self, request, queryset, search_term):
+        # Вместо LIKE по всему тексту — индекс FTS5 по заголовку и тексту.
+        if not search_term.strip():
+            return queryset, False
+        return filter_matching(queryset, search_term), False
+
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(EstimatedCountAdmin):
     list_display = (
         'text',
         'post',
         'author',
         'created_at',
     )
+    # Связанные объекты нужны и колонкам, и Comment.__str__ в подписи
+    # флажка действий — берём их JOIN-ом, без запроса на строку.
+    list_select_related = ('post', 'author')
+    raw_id_fields = ('author',)
+    # Подсказки постов ищутся через FTS5, как и в списке PostAdmin.
+    autocomplete_fields = ('post',)
     search_fields = ('text',)
     list_filter = ('created_at',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('post__text')
+
+
+@admin.register(ImageTask)
+class ImageTaskAdmin(EstimatedCountAdmin):
+    list_display = (
+        'image_name',
+        'post',
+        'status',
+        'attempts',
+        'run_after',
+        'updated_at',
+    )
+    list_select_related = ('post',)
+    list_filter = ('status',)
+    raw_id_fields = ('post',)
+    readonly_fields = ('last_error',)
@@ -1,7 +1,19 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class BlogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blog'
     verbose_name = 'Блог'
+
+    def ready(self):
+        from PIL import Image
+
+        from . import checks, signals, sqlite  # noqa: F401
+
+        # Фото больше лимита Pillow считает «бомбой» и не декодирует —
+        # это ограничивает память и в миниатюрах, и в фоновой обработке.
+        Image.MAX_IMAGE_PIXELS = getattr(
+            settings, 'IMAGE_UPLOAD_MAX_PIXELS', Image.MAX_IMAGE_PIXELS
+        )
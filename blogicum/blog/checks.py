@@ -0,0 +1,40 @@
+from django.core.checks import Error, Tags, Warning, register
+
+from .css_prune import (
+    output_path, parse, prune_rules, source_path, strip_comments,
+    stylesheet_classes, template_classes
+)
+
+
+@register(Tags.templates)
+def check_pruned_css(app_configs, **kwargs):
+    """Классы из шаблонов не должны быть вырезаны из прореженного CSS.
+
+    Сравнивается, какие классы попали бы в таблицу стилей, если собрать
+    её заново по текущим шаблонам, с теми, что в ней есть.
+    """
+    output = output_path()
+    if not output.exists():
+        return [Warning(
+            f'Нет прореженной таблицы стилей {output.name}.',
+            hint='Запустите manage.py prune_css.',
+            id='blog.W001',
+        )]
+    kept = stylesheet_classes(
+        parse(strip_comments(output.read_text('utf-8'))[1])
+    )
+    used = template_classes()
+    needed = stylesheet_classes(prune_rules(
+        parse(strip_comments(source_path().read_text('utf-8'))[1]),
+        set(used) | kept,
+    ))
+    return [
+        Error(
+            f'Класс {css_class} из шаблонов '
+            f'{", ".join(sorted(used[css_class]))} вырезан из {output.name}.',
+            hint='Запустите manage.py prune_css.',
+            id='blog.E001',
+        )
+        for css_class in sorted(needed - kept)
+        if css_class in used
+    ]
@@ -0,0 +1,260 @@
+import threading
+import time
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from .staticfiles import accepted_encodings, brotli
+
+# Типы содержимого, которые сжимаются; картинки и архивы уже сжаты.
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'application/manifest+json',
+    'image/svg+xml',
+)
+
+
+def setting(name, default):
+    return getattr(settings, f'COMPRESSION_{name}', default)
+
+
+class CompressionStats:
+    """Счётчики сжатия ответов в текущем процессе — по кодировкам.
+
+    bytes_in и bytes_out — размер тела до и после сжатия, cpu — время
+    процессора на сжатие в секундах; skipped — ответы, оставленные
+    несжатыми, по причинам.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.encodings = {}
+            self.skipped = {}
+
+    def add(self, encoding, bytes_in, bytes_out, cpu, responses=0):
+        with self._lock:
+            counters = self.encodings.setdefault(encoding, {
+                'responses': 0, 'bytes_in': 0, 'bytes_out': 0, 'cpu': 0.0,
+            })
+            counters['responses'] += responses
+            counters['bytes_in'] += bytes_in
+            counters['bytes_out'] += bytes_out
+            counters['cpu'] += cpu
+
+    def skip(self, reason):
+        with self._lock:
+            self.skipped[reason] = self.skipped.get(reason, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'encodings': {
+                    encoding: {
+                        **counters,
+                        'ratio': (
+                            counters['bytes_out'] / counters['bytes_in']
+                            if counters['bytes_in'] else None
+                        ),
+                    }
+                    for encoding, counters in self.encodings.items()
+                },
+                'skipped': dict(self.skipped),
+            }
+
+
+stats = CompressionStats()
+
+
+class GzipCompressor:
+    """Потоковый gzip через zlib без GzipFile и промежуточного BytesIO.
+
+    Заголовок gzip пишет сам zlib (wbits=31). Новый компрессор копируется
+    из заготовки для уровня сжатия, а не настраивается заново.
+    """
+
+    encoding = 'gzip'
+    _prototypes = {}
+
+    def __init__(self, level):
+        prototype = self._prototypes.get(level)
+        if prototype is None:
+            prototype = self._prototypes.setdefault(
+                level, zlib.compressobj(level, zlib.DEFLATED, 31)
+            )
+        self._compressor = prototype.copy()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor:
+
+    encoding = 'br'
+
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(
+            mode=brotli.MODE_TEXT, quality=quality
+        )
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def choose_compressor(request):
+    """Компрессор для кодировки, которую принимает клиент, или None."""
+    accepted = accepted_encodings(request)
+    if brotli is not None and 'br' in accepted:
+        return BrotliCompressor(setting('BROTLI_QUALITY', 5))
+    if 'gzip' in accepted:
+        return GzipCompressor(setting('GZIP_LEVEL', 6))
+    return None
+
+
+def _compress_chunk(compressor, chunk):
+    if isinstance(chunk, str):
+        chunk = chunk.encode()
+    started = time.thread_time()
+    # Буфер сбрасывается после каждой части: клиент получает её сразу,
+    # а не когда накопится блок сжатия.
+    data = compressor.compress(chunk) + compressor.flush()
+    stats.add(
+        compressor.encoding, len(chunk), len(data),
+        time.thread_time() - started,
+    )
+    return data
+
+
+def _finish(compressor):
+    started = time.thread_time()
+    data = compressor.finish()
+    stats.add(
+        compressor.encoding, 0, len(data), time.thread_time() - started,
+        responses=1,
+    )
+    return data
+
+
+def _compressed_chunks(compressor, chunks):
+    for chunk in chunks:
+        data = _compress_chunk(compressor, chunk)
+        if data:
+            yield data
+    yield _finish(compressor)
+
+
+async def _compressed_async_chunks(compressor, chunks):
+    async for chunk in chunks:
+        data = _compress_chunk(compressor, chunk)
+        if data:
+            yield data
+    yield _finish(compressor)
+
+
+class CompressionMiddleware:
+    """Сжимает ответы brotli или gzip — что принимает клиент.
+
+    Не сжимаются ответы меньше COMPRESSION_MIN_SIZE байт, уже сжатые
+    (с Content-Encoding, например статика из blog.staticfiles) и
+    несжимаемых типов. Потоковые ответы сжимаются по частям.
+    Время сжатия обычного ответа видно в заголовке Server-Timing,
+    накопленные счётчики — в blog.compression.stats.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        reason = self.skip_reason(response)
+        if reason is None:
+            patch_vary_headers(response, ('Accept-Encoding',))
+            compressor = choose_compressor(request)
+            if compressor is None:
+                reason = 'not_accepted'
+        if reason is not None:
+            if reason != 'encoded':
+                stats.skip(reason)
+            return response
+        if response.streaming:
+            self.compress_stream(response, compressor)
+        else:
+            self.compress_content(response, compressor)
+        return response
+
+    def skip_reason(self, response):
+        if response.has_header('Content-Encoding'):
+            return 'encoded'
+        content_type = response.get('Content-Type', '').lower()
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return 'content_type'
+        if response.status_code == 206:
+            return 'partial'
+        min_size = setting('MIN_SIZE', 512)
+        if response.streaming:
+            length = response.get('Content-Length')
+            if length is not None and int(length) < min_size:
+                return 'small'
+        elif len(response.content) < min_size:
+            return 'small'
+        return None
+
+    def compress_stream(self, response, compressor):
+        if response.is_async:
+            response.streaming_content = _compressed_async_chunks(
+                compressor, response.streaming_content
+            )
+        else:
+            response.streaming_content = _compressed_chunks(
+                compressor, response.streaming_content
+            )
+        # Длина сжатого потока заранее неизвестна.
+        del response.headers['Content-Length']
+        self.mark_encoded(response, compressor)
+
+    def compress_content(self, response, compressor):
+        content = response.content
+        started = time.thread_time()
+        compressed = compressor.compress(content) + compressor.finish()
+        cpu = time.thread_time() - started
+        if len(compressed) >= len(content):
+            stats.skip('incompressible')
+            return
+        stats.add(
+            compressor.encoding, len(content), len(compressed), cpu,
+            responses=1,
+        )
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        timing = f'compress;dur={cpu * 1000:.2f};desc="{compressor.encoding}"'
+        if response.has_header('Server-Timing'):
+            timing = f"{response['Server-Timing']}, {timing}"
+        response.headers['Server-Timing'] = timing
+        self.mark_encoded(response, compressor)
+
+    def mark_encoded(self, response, compressor):
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            # Сжатое тело отличается побайтно — строгий ETag становится
+            # слабым, как в django.middleware.gzip.
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = compressor.encoding
@@ -0,0 +1,320 @@
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.template import Context, Template
+from django.utils.module_loading import import_string
+
+# Правила внутри этих at-правил разбираются и прореживаются так же,
+# как правила верхнего уровня; остальные (@keyframes, @font-face)
+# переносятся целиком.
+GROUPING_AT_RULES = ('@media', '@supports')
+
+CLASS_SELECTOR = re.compile(r'\.(-?[_a-zA-Z][\w-]*)')
+# Внутри :not() классы означают их отсутствие, а в [атрибутах] —
+# вообще не классы, поэтому при поиске классов селектора их не смотрим.
+IGNORED_IN_SELECTOR = re.compile(r':not\([^)]*\)|\[[^\]]*\]')
+CLASS_NAME = re.compile(r'-?[_a-zA-Z][\w-]*')
+
+CLASS_ATTRIBUTE = re.compile(r'\bclass\s*=\s*(["\'])(.*?)\1', re.S)
+TEMPLATE_TAG = re.compile(r'{%(.*?)%}|{{(.*?)}}', re.S)
+QUOTED = re.compile(r'"([^"]*)"|\'([^\']*)\'')
+CLASS_LIST_CALL = re.compile(
+    r'classList\.(?:add|remove|toggle)\(([^)]*)\)'
+)
+KEYFRAMES_NAME = re.compile(r'@(?:-webkit-)?keyframes\s+([\w-]+)')
+
+# Формы, которые шаблоны выводят через {% bootstrap_form %}.
+FORMS = (
+    'blog.forms.PostForm',
+    'blog.forms.CommentForm',
+    'blog.forms.UserForm',
+    'django.contrib.auth.forms.AuthenticationForm',
+    'django.contrib.auth.forms.UserCreationForm',
+    'django.contrib.auth.forms.PasswordChangeForm',
+    'django.contrib.auth.forms.PasswordResetForm',
+    'django.contrib.auth.forms.SetPasswordForm',
+)
+
+
+class Rule:
+    """Правило таблицы стилей: селектор с объявлениями или at-правило.
+
+    У группирующих at-правил есть children — вложенные правила,
+    у остальных тело хранится как есть в body.
+    """
+
+    def __init__(self, prelude, body=None, children=None):
+        self.prelude = prelude
+        self.body = body
+        self.children = children
+
+    @property
+    def is_at_rule(self):
+        return self.prelude.startswith('@')
+
+    def render(self):
+        if self.children is not None:
+            return '%s{%s}' % (
+                self.prelude,
+                ''.join(child.render() for child in self.children),
+            )
+        if self.body is None:
+            return self.prelude + ';'
+        return '%s{%s}' % (self.prelude, self.body)
+
+
+def _skip_string(css, position):
+    quote = css[position]
+    position += 1
+    while position < len(css) and css[position] != quote:
+        position += 2 if css[position] == '\\' else 1
+    return position + 1
+
+
+def _read_until(css, position, stops):
+    """Позиция первого символа из stops вне строк и скобок."""
+    depth = 0
+    while position < len(css):
+        char = css[position]
+        if char in '"\'':
+            position = _skip_string(css, position)
+            continue
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif not depth and char in stops:
+            return position
+        position += 1
+    return position
+
+
+def _matching_brace(css, position):
+    """Позиция }, закрывающей блок, который открыт перед position."""
+    depth = 1
+    while position < len(css):
+        char = css[position]
+        if char in '"\'':
+            position = _skip_string(css, position)
+            continue
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if not depth:
+                return position
+        position += 1
+    return position
+
+
+def strip_comments(css):
+    """Убирает комментарии; первый /*! … */ (лицензию) возвращает отдельно."""
+    license = ''
+    match = re.search(r'/\*!.*?\*/', css, re.S)
+    if match:
+        license = match.group()
+    return license, re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+
+
+def parse(css, position=0):
+    """Разбирает таблицу стилей без комментариев в список Rule."""
+    rules = []
+    while True:
+        while position < len(css) and css[position] in ' \t\r\n':
+            position += 1
+        if position >= len(css) or css[position] == '}':
+            return rules
+        end = _read_until(css, position, '{;}')
+        prelude = css[position:end].strip()
+        if end >= len(css) or css[end] != '{':
+            rules.append(Rule(prelude))
+            position = end + (end < len(css) and css[end] == ';')
+            continue
+        close = _matching_brace(css, end + 1)
+        if prelude.lower().startswith(GROUPING_AT_RULES):
+            rules.append(Rule(prelude, children=parse(css[end + 1:close])))
+        else:
+            rules.append(Rule(prelude, body=css[end + 1:close]))
+        position = close + 1
+
+
+def split_selectors(prelude):
+    selectors = []
+    position = 0
+    while position <= len(prelude):
+        end = _read_until(prelude, position, ',')
+        selectors.append(prelude[position:end].strip())
+        position = end + 1
+    return selectors
+
+
+def selector_classes(selector):
+    return set(CLASS_SELECTOR.findall(IGNORED_IN_SELECTOR.sub('', selector)))
+
+
+def stylesheet_classes(rules):
+    """Все классы, встречающиеся в селекторах правил rules."""
+    classes = set()
+    for rule in rules:
+        if rule.children is not None:
+            classes |= stylesheet_classes(rule.children)
+        elif not rule.is_at_rule:
+            for selector in split_selectors(rule.prelude):
+                classes |= selector_classes(selector)
+    return classes
+
+
+def prune_rules(rules, used):
+    """Правила rules, которые могут применяться при классах used.
+
+    Из списка селекторов правила остаются только те, все классы
+    которых используются; группа без правил выбрасывается целиком.
+    """
+    kept = []
+    for rule in rules:
+        if rule.children is not None:
+            children = prune_rules(rule.children, used)
+            if children:
+                kept.append(Rule(rule.prelude, children=children))
+        elif rule.is_at_rule:
+            kept.append(rule)
+        else:
+            selectors = [
+                selector for selector in split_selectors(rule.prelude)
+                if selector_classes(selector) <= used
+            ]
+            if selectors:
+                kept.append(Rule(','.join(selectors), body=rule.body))
+    return kept
+
+
+def drop_unused_keyframes(rules, text):
+    """Убирает @keyframes, имя которых не упоминается в text."""
+    kept = []
+    for rule in rules:
+        match = KEYFRAMES_NAME.match(rule.prelude)
+        if match and match.group(1) not in text:
+            continue
+        if rule.children is not None:
+            rule = Rule(
+                rule.prelude,
+                children=drop_unused_keyframes(rule.children, text),
+            )
+        kept.append(rule)
+    return kept
+
+
+def prune(css, used, keep_license=True):
+    """Таблица стилей css без правил для классов, которых нет в used."""
+    license, css = strip_comments(css)
+    rules = prune_rules(parse(css), used)
+    declarations = ''.join(
+        rule.render() for rule in rules
+        if not KEYFRAMES_NAME.match(rule.prelude)
+    )
+    rules = drop_unused_keyframes(rules, declarations)
+    charset = ''
+    if rules and rules[0].prelude.startswith('@charset'):
+        # @charset действует, только если стоит в самом начале файла.
+        charset = rules.pop(0).render()
+    pruned = ''.join(rule.render() for rule in rules)
+    return charset + (license if keep_license else '') + pruned + '\n'
+
+
+def classes_in_html(text):
+    """Классы из атрибутов class и вызовов classList в разметке.
+
+    Значения, которые подставляют теги шаблона, известны только при
+    отрисовке, поэтому классами считаются и слова из строк внутри тегов
+    ({% post_picture post "img-fluid" %}); лишний класс лишь оставляет
+    в таблице стилей лишнее правило.
+    """
+    classes = set()
+    for _, value in CLASS_ATTRIBUTE.findall(text):
+        classes.update(CLASS_NAME.findall(TEMPLATE_TAG.sub(' ', value)))
+    for tag in TEMPLATE_TAG.finditer(text):
+        for quoted in QUOTED.findall(tag.group(0)):
+            classes.update(CLASS_NAME.findall(''.join(quoted)))
+    for arguments in CLASS_LIST_CALL.findall(text):
+        for quoted in QUOTED.findall(arguments):
+            classes.update(CLASS_NAME.findall(''.join(quoted)))
+    return classes
+
+
+def template_dirs():
+    return [
+        Path(directory)
+        for engine in settings.TEMPLATES
+        for directory in engine.get('DIRS', ())
+    ]
+
+
+def template_classes(names=None):
+    """Классы из шаблонов проекта: класс → множество имён шаблонов.
+
+    names ограничивает разбор перечисленными шаблонами.
+    """
+    found = {}
+    for directory in template_dirs():
+        for path in sorted(directory.rglob('*.html')):
+            name = path.relative_to(directory).as_posix()
+            if names is not None and name not in names:
+                continue
+            for css_class in classes_in_html(path.read_text('utf-8')):
+                found.setdefault(css_class, set()).add(name)
+    return found
+
+
+def form_classes(form_paths=FORMS):
+    """Классы, которые django_bootstrap5 выводит для форм проекта.
+
+    Каждая форма отрисовывается пустой и с ошибками, чтобы попали
+    и классы состояния вроде is-invalid.
+    """
+    template = Template(
+        '{% load django_bootstrap5 %}{% bootstrap_form form %}'
+        '{% bootstrap_button button_type="submit" content="" %}'
+    )
+    classes = set()
+    for path in form_paths:
+        form_class = import_string(path)
+        for data in (None, {}):
+            try:
+                form = form_class(data=data)
+            except TypeError:
+                # Формы смены пароля первым аргументом ждут пользователя.
+                form = form_class(None, data=data)
+            classes |= classes_in_html(
+                template.render(Context({'form': form}))
+            )
+    return classes
+
+
+def css_setting(name, default):
+    return getattr(settings, f'CSS_PRUNE_{name}', default)
+
+
+def source_path():
+    return Path(css_setting(
+        'SOURCE', settings.BASE_DIR / 'static_dev/css/bootstrap.min.css'
+    ))
+
+
+def output_path():
+    return Path(css_setting(
+        'OUTPUT', settings.BASE_DIR / 'static_dev/css/bootstrap.pruned.css'
+    ))
+
+
+def critical_path():
+    return Path(css_setting(
+        'CRITICAL_OUTPUT',
+        settings.BASE_DIR / 'templates/includes/critical_css.html',
+    ))
+
+
+def critical_templates():
+    return css_setting(
+        'CRITICAL_TEMPLATES', ('base.html', 'includes/header.html')
+    )
@@ -1,11 +1,190 @@
+import warnings
+
 from django import forms
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+from django.template.defaultfilters import filesizeformat
 from django.utils import timezone
+from PIL import Image
 
 from .models import Post, Comment
+from .reference import get_table
 
 User = get_user_model()
 
+# Поля формы поста, которые при большом справочнике заменяются полем
+# с подсказками, и поле модели справочника для поиска по началу.
+LOOKUP_FIELDS = {
+    'location': 'name',
+    'category': 'title',
+}
+
+
+def is_large_table(model, threshold):
+    """Больше ли threshold строк в таблице; ответ кешируется."""
+    table = get_table(model)
+    if table is not None:
+        return len(table.rows) > threshold
+    key = f'table-size:{model._meta.label_lower}'
+    size = cache.get(key)
+    if size is None:
+        size = model._default_manager.order_by()[:threshold + 1].count()
+        cache.set(
+            key, size, getattr(settings, 'LOOKUP_SIZE_CACHE_TIMEOUT', 600)
+        )
+    return size > threshold
+
+
+class BoundedImageField(forms.ImageField):
+    """ImageField, который проверяет размеры фото до его декодирования.
+
+    Загрузка уже лежит во временном файле (FILE_UPLOAD_HANDLERS), а здесь
+    по заголовку отсеиваются слишком большие файлы и «бомбы» — картинки,
+    распаковка которых заняла бы больше IMAGE_UPLOAD_MAX_PIXELS пикселей.
+    """
+
+    default_error_messages = {
+        'too_large': 'Файл больше %(limit)s.',
+        'too_many_pixels': (
+            'Изображение %(width)s×%(height)s слишком велико: допускается '
+            'не больше %(side)s пикселей по стороне и %(pixels)s пикселей '
+            'всего.'
+        ),
+        'decompression_bomb': (
+            'Изображение при распаковке займёт слишком много памяти.'
+        ),
+    }
+
+    def check_limits(self, file):
+        max_bytes = getattr(settings, 'IMAGE_UPLOAD_MAX_BYTES', 10 * 2 ** 20)
+        if file.size > max_bytes:
+            raise ValidationError(
+                self.error_messages['too_large'], code='too_large',
+                params={'limit': filesizeformat(max_bytes)},
+            )
+        max_side = getattr(settings, 'IMAGE_UPLOAD_MAX_SIDE', 8000)
+        max_pixels = getattr(settings, 'IMAGE_UPLOAD_MAX_PIXELS', 25_000_000)
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('error', Image.DecompressionBombWarning)
+                # Image.open читает только заголовок — пиксели не декодируются.
+                with Image.open(file) as image:
+                    width, height = image.size
+        except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+            raise ValidationError(
+                self.error_messages['decompression_bomb'],
+                code='decompression_bomb',
+            )
+        except Exception:
+            # Нечитаемый файл отклонит проверка ImageField.
+            return
+        finally:
+            file.seek(0)
+        if max(width, height) > max_side or width * height > max_pixels:
+            raise ValidationError(
+                self.error_messages['too_many_pixels'],
+                code='too_many_pixels',
+                params={
+                    'width': width, 'height': height,
+                    'side': max_side, 'pixels': max_pixels,
+                },
+            )
+
+    def to_python(self, data):
+        file = forms.FileField.to_python(self, data)
+        if file is not None:
+            self.check_limits(file)
+        return super().to_python(data)
+
+
+class ReferenceChoiceIterator(forms.models.ModelChoiceIterator):
+    """Варианты выбора из снимка справочника в памяти процесса."""
+
+    def __iter__(self):
+        table = self.field.reference_table()
+        if table is None:
+            yield from super().__iter__()
+            return
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for row in table.rows:
+            yield self.choice(row)
+
+    def __len__(self):
+        table = self.field.reference_table()
+        if table is None:
+            return super().__len__()
+        return len(table.rows) + (self.field.empty_label is not None)
+
+
+class ReferenceChoiceField(forms.ModelChoiceField):
+    """Выбор строки справочника без запросов к базе.
+
+    И список вариантов, и проверка отправленного pk обслуживаются
+    снимком из blog.reference, пока queryset поля не отфильтрован,
+    а справочник помещается в память.
+    """
+
+    iterator = ReferenceChoiceIterator
+
+    def reference_table(self):
+        pk_name = self.queryset.model._meta.pk.name
+        if self.queryset.query.where or self.to_field_name not in (
+            None, pk_name
+        ):
+            return None
+        return get_table(self.queryset.model)
+
+    def to_python(self, value):
+        table = None if value in self.empty_values else self.reference_table()
+        if table is None:
+            return super().to_python(value)
+        if isinstance(value, self.queryset.model):
+            value = value.pk
+        try:
+            pk = self.queryset.model._meta.pk.to_python(value)
+        except ValidationError:
+            pk = None
+        row = table.get('pk', pk)
+        if row is None:
+            raise ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+        return row
+
+
+class LookupWidget(forms.Widget):
+    """Поле ввода с подсказками вместо <select> со всеми строками.
+
+    В форму уходит только pk выбранной строки; подсказки подгружаются
+    из view blog:lookup, а при отрисовке читается лишь текущая строка.
+    """
+
+    template_name = 'includes/widgets/lookup.html'
+
+    def __init__(self, lookup, queryset, attrs=None):
+        super().__init__({'class': 'form-control', **(attrs or {})})
+        self.lookup = lookup
+        self.queryset = queryset
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        label = ''
+        if context['widget']['value'] not in (None, ''):
+            selected = self.queryset.filter(
+                pk=context['widget']['value']
+            ).first()
+            label = str(selected) if selected is not None else ''
+        context['widget'].update(
+            label=label, url=reverse('blog:lookup', args=[self.lookup])
+        )
+        return context
+
 
 class PostForm(forms.ModelForm):
     class Meta:
@@ -34,10 +213,26 @@ class PostForm(forms.ModelForm):
             'image': 'Изображение',
             'is_published': 'Опубликовать',
         }
+        field_classes = {
+            'image': BoundedImageField,
+            'location': ReferenceChoiceField,
+            'category': ReferenceChoiceField,
+        }
         help_texts = {
             'is_published': 'Снимите галочку, чтобы сохранить пост как черновик',
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Проверка выбранного значения и так читает одну строку по pk,
+        # а вот список всех строк для <select> большого справочника
+        # заменяем полем с подсказками.
+        threshold = getattr(settings, 'POST_FORM_LOOKUP_THRESHOLD', 100)
+        for name in LOOKUP_FIELDS:
+            field = self.fields[name]
+            if is_large_table(field.queryset.model, threshold):
+                field.widget = LookupWidget(name, field.queryset)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
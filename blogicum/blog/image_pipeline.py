@@ -0,0 +1,205 @@
+import io
+import logging
+import os
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .media import release_images
+from .models import ImageTask, Post, new_version
+from .page_cache import invalidate_tags
+from .signals import stored_post_page_tags
+from .thumbnails import FORMATS, get_thumbnail, thumbnail_widths
+
+logger = logging.getLogger(__name__)
+
+# Форматы, в которых фото сохраняется после обработки, и расширения
+# файлов; остальные форматы перекодируются в JPEG.
+KEPT_FORMATS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp'}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def setting(name, default):
+    return getattr(settings, f'IMAGE_PIPELINE_{name}', default)
+
+
+def enqueue_image(post):
+    """Ставит фото поста в очередь обработки.
+
+    При IMAGE_PIPELINE_AUTOSTART после коммита будятся обработчики
+    текущего процесса, иначе задачу заберёт manage.py process_images.
+    """
+    if not post.image:
+        return None
+    task = ImageTask.objects.create(post=post, image_name=post.image.name)
+    if setting('AUTOSTART', False):
+        transaction.on_commit(wake_workers)
+    return task
+
+
+def claim_task():
+    """Забирает очередную готовую к запуску задачу или возвращает None.
+
+    Задача помечается обрабатываемой условным UPDATE, поэтому одну
+    задачу не заберут два обработчика — ни потоки, ни процессы.
+    """
+    while True:
+        task = ImageTask.objects.filter(
+            status=ImageTask.Status.PENDING, run_after__lte=timezone.now()
+        ).order_by('run_after', 'pk').first()
+        if task is None:
+            return None
+        claimed = ImageTask.objects.filter(
+            pk=task.pk, status=ImageTask.Status.PENDING
+        ).update(
+            status=ImageTask.Status.PROCESSING,
+            attempts=F('attempts') + 1,
+            updated_at=timezone.now(),
+        )
+        if claimed:
+            task.refresh_from_db()
+            return task
+
+
+def requeue_stale_tasks():
+    """Возвращает в очередь задачи, брошенные упавшим обработчиком."""
+    stale = timezone.now() - timedelta(
+        seconds=setting('STALE_AFTER', 15 * 60)
+    )
+    return ImageTask.objects.filter(
+        status=ImageTask.Status.PROCESSING, updated_at__lt=stale
+    ).update(status=ImageTask.Status.PENDING, run_after=timezone.now())
+
+
+def clean_image(data):
+    """Поворачивает фото по EXIF, убирает метаданные и пережимает его.
+
+    Возвращает байты, размер и формат результата.
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        image_format = source.format
+        max_side = setting('MAX_SIDE', 2560)
+        source.draft(source.mode, (max_side, max_side))
+        image = ImageOps.exif_transpose(source)
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        if image_format not in KEPT_FORMATS:
+            image_format = 'JPEG'
+        if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        output = io.BytesIO()
+        # Метаданные (EXIF, GPS, профили) передаются в save только явно —
+        # без них в файл попадают одни пиксели.
+        image.save(
+            output, image_format,
+            quality=setting('QUALITY', 85), optimize=True,
+            **({'progressive': True} if image_format == 'JPEG' else {})
+        )
+        return output.getvalue(), image.size, image_format
+
+
+def process_task(task):
+    """Обрабатывает фото задачи и подменяет им исходный файл поста."""
+    post = Post.objects.filter(pk=task.post_id).first()
+    if post is None or post.image.name != task.image_name:
+        # Пост удалён или фото уже заменено — обрабатывать нечего.
+        return
+    with default_storage.open(task.image_name) as source:
+        data, (width, height), image_format = clean_image(source.read())
+    root, extension = os.path.splitext(task.image_name)
+    # .jpeg — второе принятое расширение JPEG; у PNG или WebP, загруженных
+    # под чужим расширением, оно меняется на своё, иначе файл отдавался
+    # бы с неверным Content-Type.
+    allowed = {KEPT_FORMATS[image_format]}
+    if image_format == 'JPEG':
+        allowed.add('.jpeg')
+    if extension.lower() not in allowed:
+        extension = KEPT_FORMATS[image_format]
+    # Имя исходного файла уже содержит подкаталог хеша; хранилищу
+    # передаётся каталог фото постов, подкаталог оно добавит само.
+    name = default_storage.save(
+        posixpath.join(
+            Post.image.field.upload_to, posixpath.basename(root) + extension
+        ),
+        ContentFile(data),
+    )
+    # Условный UPDATE одним запросом: фото, заменённое автором за время
+    # обработки, не будет затёрто.
+    replaced = Post.objects.filter(
+        pk=task.post_id, image=task.image_name
+    ).update(
+        image=name, image_size=f'{width}x{height}', version=new_version()
+    )
+    if not replaced:
+        release_images(name)
+        return
+    invalidate_tags(*stored_post_page_tags(task.post_id))
+    release_images(task.image_name)
+    for variant_width in thumbnail_widths():
+        for fmt in FORMATS:
+            get_thumbnail(name, variant_width, fmt)
+
+
+def run_task(task):
+    """Выполняет задачу и записывает её исход; ошибка — повод повторить."""
+    try:
+        process_task(task)
+    except Exception as error:
+        logger.exception('Не удалось обработать фото %s', task.image_name)
+        retry = task.attempts < setting('MAX_ATTEMPTS', 5)
+        ImageTask.objects.filter(pk=task.pk).update(
+            status=(
+                ImageTask.Status.PENDING if retry
+                else ImageTask.Status.FAILED
+            ),
+            run_after=timezone.now() + timedelta(
+                seconds=setting('RETRY_DELAY', 30) * 2 ** (task.attempts - 1)
+            ),
+            last_error=repr(error),
+            updated_at=timezone.now(),
+        )
+        return False
+    ImageTask.objects.filter(pk=task.pk).update(
+        status=ImageTask.Status.DONE, last_error='', updated_at=timezone.now()
+    )
+    return True
+
+
+def drain_queue():
+    """Выполняет готовые задачи, пока они есть; возвращает их число."""
+    done = 0
+    try:
+        while True:
+            task = claim_task()
+            if task is None:
+                return done
+            run_task(task)
+            done += 1
+    finally:
+        close_old_connections()
+
+
+def wake_workers():
+    """Будит пул обработчиков текущего процесса.
+
+    Пул создаётся при первом вызове; каждый вызов добавляет в него
+    проход по очереди, так что новая задача не ждёт следующего опроса.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=setting('WORKERS', 2),
+                thread_name_prefix='image-pipeline',
+            )
+    _pool.submit(drain_queue)
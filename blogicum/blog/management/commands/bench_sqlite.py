@@ -0,0 +1,240 @@
+import queue
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from blog.sqlite import apply_pragmas, sqlite_pragmas
+
+SCHEMA = """
+    CREATE TABLE post (
+        id INTEGER PRIMARY KEY,
+        title TEXT NOT NULL,
+        text TEXT NOT NULL,
+        comment_count INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE comment (
+        id INTEGER PRIMARY KEY,
+        post_id INTEGER NOT NULL REFERENCES post (id),
+        text TEXT NOT NULL,
+        created_at REAL NOT NULL
+    );
+    CREATE INDEX comment_post_idx ON comment (post_id, created_at);
+"""
+
+# Режим → (PRAGMA соединения, начало пишущей транзакции, пишет ли
+# один поток пачками, как blog.write_queue). default — как было:
+# журнал отката и отложенные транзакции Django.
+MODES = {
+    'default': ({}, 'BEGIN', False),
+    'tuned': (None, 'BEGIN IMMEDIATE', False),
+    'batched': (None, 'BEGIN IMMEDIATE', True),
+}
+
+
+def percentile(values, share):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Worker(threading.Thread):
+
+    def __init__(self, path, pragmas, deadline, action, posts):
+        super().__init__()
+        self.path = path
+        self.pragmas = pragmas
+        self.deadline = deadline
+        self.action = action
+        self.posts = posts
+        self.done = 0
+        self.locked = 0
+        self.latencies = []
+
+    def run(self):
+        # Таймаут 5 с — как у sqlite3 по умолчанию, с которым Django
+        # открывает соединения.
+        connection = sqlite3.connect(
+            self.path, timeout=5, isolation_level=None,
+            check_same_thread=False,
+        )
+        apply_pragmas(connection, self.pragmas)
+        while time.monotonic() < self.deadline:
+            started = time.perf_counter()
+            try:
+                self.action(connection, random.randint(1, self.posts))
+            except sqlite3.OperationalError:
+                if connection.in_transaction:
+                    connection.execute('ROLLBACK')
+                self.locked += 1
+                continue
+            self.latencies.append(time.perf_counter() - started)
+            self.done += 1
+        connection.close()
+
+
+def read_feed(connection, post_id):
+    """Лента и комментарии одного поста — как index и post_detail."""
+    connection.execute(
+        'SELECT id, title, comment_count FROM post'
+        ' ORDER BY id DESC LIMIT 10 OFFSET ?',
+        (post_id % 100,)
+    ).fetchall()
+    connection.execute(
+        'SELECT id, text FROM comment WHERE post_id = ?'
+        ' ORDER BY created_at LIMIT 20',
+        (post_id,)
+    ).fetchall()
+
+
+def make_writer(begin):
+    def add_comment(connection, post_id):
+        """Чтение поста и запись комментария — как add_comment."""
+        connection.execute(begin)
+        connection.execute(
+            'SELECT comment_count FROM post WHERE id = ?', (post_id,)
+        ).fetchone()
+        connection.execute(
+            'INSERT INTO comment (post_id, text, created_at)'
+            ' VALUES (?, ?, ?)',
+            (post_id, 'Комментарий', time.time())
+        )
+        connection.execute(
+            'UPDATE post SET comment_count = comment_count + 1'
+            ' WHERE id = ?',
+            (post_id,)
+        )
+        connection.execute('COMMIT')
+    return add_comment
+
+
+class GroupWriter(threading.Thread):
+    """Единственный писатель, как в blog.write_queue.
+
+    Накопившиеся комментарии записываются одной транзакцией, после
+    фиксации каждый писатель-запрос получает подтверждение.
+    """
+
+    def __init__(self, path, pragmas, begin):
+        super().__init__(daemon=True)
+        self.path = path
+        self.pragmas = pragmas
+        self.begin = begin
+        self.queue = queue.Queue()
+
+    def add_comment(self, connection, post_id):
+        done = threading.Event()
+        self.queue.put((post_id, done))
+        done.wait()
+
+    def run(self):
+        connection = sqlite3.connect(
+            self.path, timeout=5, isolation_level=None,
+            check_same_thread=False,
+        )
+        apply_pragmas(connection, self.pragmas)
+        while True:
+            batch = [self.queue.get()]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            connection.execute(self.begin)
+            connection.executemany(
+                'INSERT INTO comment (post_id, text, created_at)'
+                ' VALUES (?, ?, ?)',
+                [(post_id, 'Комментарий', time.time()) for post_id, _ in batch]
+            )
+            connection.executemany(
+                'UPDATE post SET comment_count = comment_count + 1'
+                ' WHERE id = ?',
+                [(post_id,) for post_id, _ in batch]
+            )
+            connection.execute('COMMIT')
+            for _, done in batch:
+                done.set()
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность SQLite при параллельных '
+        'чтении и записи: без настроек, с PRAGMA из blog.sqlite и с записью '
+        'комментариев пачками через одного писателя.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument(
+            '--seconds', type=float, default=5,
+            help='Длительность прогона каждого режима.'
+        )
+        parser.add_argument(
+            '--posts', type=int, default=1000,
+            help='Сколько постов в тестовой базе.'
+        )
+
+    def handle(self, *args, readers, writers, seconds, posts, **options):
+        self.stdout.write(
+            f'Читателей: {readers}, писателей: {writers}, '
+            f'{seconds:g} с на режим.'
+        )
+        self.stdout.write(
+            f'{"режим":<8} {"чтений/с":>10} {"записей/с":>10} '
+            f'{"locked":>7} {"p95 записи, мс":>15}'
+        )
+        for mode, (pragmas, begin, batched) in MODES.items():
+            if pragmas is None:
+                pragmas = sqlite_pragmas()
+            with tempfile.TemporaryDirectory() as directory:
+                path = str(Path(directory) / 'bench.sqlite3')
+                self.create_database(path, posts)
+                if batched:
+                    group_writer = GroupWriter(path, pragmas, begin)
+                    group_writer.start()
+                    write = group_writer.add_comment
+                else:
+                    write = make_writer(begin)
+                deadline = time.monotonic() + seconds
+                workers = [
+                    Worker(path, pragmas, deadline, read_feed, posts)
+                    for _ in range(readers)
+                ] + [
+                    Worker(path, pragmas, deadline, write, posts)
+                    for _ in range(writers)
+                ]
+                for worker in workers:
+                    worker.start()
+                for worker in workers:
+                    worker.join()
+            reads = sum(worker.done for worker in workers[:readers])
+            writes = sum(worker.done for worker in workers[readers:])
+            locked = sum(worker.locked for worker in workers)
+            write_p95 = percentile(
+                [
+                    latency for worker in workers[readers:]
+                    for latency in worker.latencies
+                ],
+                0.95,
+            )
+            self.stdout.write(
+                f'{mode:<8} {reads / seconds:>10.0f} '
+                f'{writes / seconds:>10.0f} {locked:>7} '
+                f'{write_p95 * 1000:>15.1f}'
+            )
+
+    def create_database(self, path, posts):
+        connection = sqlite3.connect(path)
+        connection.executescript(SCHEMA)
+        connection.executemany(
+            'INSERT INTO post (title, text) VALUES (?, ?)',
+            ((f'Пост {i}', 'Текст ' * 50) for i in range(posts))
+        )
+        connection.commit()
+        connection.close()
@@ -0,0 +1,45 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from blog.image_pipeline import drain_queue, requeue_stale_tasks, setting
+
+
+class Command(BaseCommand):
+    help = 'Обрабатывает очередь загруженных фото постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Сколько фото обрабатывать параллельно.'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Пауза между опросами очереди, секунды.'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Обработать готовые задачи и завершиться.'
+        )
+
+    def handle(self, *args, workers, interval, once, **options):
+        workers = workers or setting('WORKERS', 2)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                requeued = requeue_stale_tasks()
+                if requeued:
+                    self.stdout.write(f'Возвращено в очередь: {requeued}.')
+                done = sum(pool.map(
+                    lambda _: drain_queue(), range(workers)
+                ))
+                if done:
+                    self.stdout.write(f'Обработано фото: {done}.')
+                if once:
+                    break
+                time.sleep(interval)
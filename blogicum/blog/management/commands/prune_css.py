@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from blog.css_prune import (
+    critical_path, critical_templates, form_classes, output_path, prune,
+    source_path, template_classes
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Собирает из bootstrap.min.css таблицу стилей только с классами, '
+        'которые используют шаблоны проекта, и критический CSS для '
+        'base.html.'
+    )
+    # Команда и исправляет ошибки blog.E001 — проверки её не блокируют.
+    requires_system_checks = []
+
+    def handle(self, *args, **options):
+        source = source_path().read_text('utf-8')
+        used = set(template_classes()) | form_classes()
+        pruned = prune(source, used)
+        output_path().write_text(pruned, 'utf-8')
+        # Критический CSS — правила для шапки страницы; он встраивается
+        # в base.html, остальное догружается из прореженного файла.
+        critical = prune(
+            source, set(template_classes(critical_templates())),
+            keep_license=False,
+        )
+        critical_path().write_text(
+            '{% verbatim %}' + critical.strip() + '{% endverbatim %}\n',
+            'utf-8',
+        )
+        self.stdout.write(
+            f'{output_path().name}: {len(pruned)} байт из {len(source)}, '
+            f'критический CSS: {len(critical)} байт.'
+        )
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from blog.models import Comment, Post, new_version
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает Post.comment_count по таблице комментариев.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько постов проверять за один проход.'
+        )
+
+    def handle(self, *args, batch_size, **options):
+        actual_count = Coalesce(
+            Subquery(
+                Comment.objects.filter(post=OuterRef('pk'))
+                .order_by()
+                .values('post')
+                .annotate(total=Count('pk'))
+                .values('total'),
+                output_field=IntegerField()
+            ),
+            0
+        )
+        last_id = 0
+        checked = fixed = 0
+        while True:
+            batch = list(
+                Post.objects.filter(pk__gt=last_id)
+                .order_by('pk')
+                .annotate(actual=actual_count)
+                .values_list('pk', 'comment_count', 'actual')[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            checked += len(batch)
+            drifted = [pk for pk, stored, actual in batch if stored != actual]
+            if drifted:
+                # Пересчёт внутри UPDATE не теряет комментарии,
+                # добавленные между чтением пачки и записью.
+                fixed += Post.objects.filter(pk__in=drifted).update(
+                    comment_count=actual_count, version=new_version()
+                )
+        self.stdout.write(
+            f'Проверено постов: {checked}, исправлено: {fixed}.'
+        )
@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from blog.media import unreferenced_images
+from blog.thumbnails import delete_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Удаляет файлы фото, на которые не ссылается ни один пост.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько файлов сверять с базой за один запрос.'
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=60 * 60,
+            help='Не трогать файлы моложе стольких секунд.'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, что было бы удалено.'
+        )
+
+    def handle(self, *args, batch_size, min_age, dry_run, **options):
+        removed = 0
+        for batch in unreferenced_images(
+            batch_size, timedelta(seconds=min_age)
+        ):
+            for name in batch:
+                if dry_run:
+                    self.stdout.write(name)
+                    continue
+                default_storage.delete(name)
+                delete_thumbnails(name)
+            removed += len(batch)
+        verb = 'К удалению' if dry_run else 'Удалено'
+        self.stdout.write(f'{verb} файлов: {removed}.')
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from blog.thumbnails import trim_thumbnails
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет давно не запрошенные варианты фото, пока кеш больше '
+        'THUMBNAIL_CACHE_MAX_BYTES.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-bytes',
+            type=int,
+            help='Предельный размер кеша вместо THUMBNAIL_CACHE_MAX_BYTES.'
+        )
+
+    def handle(self, *args, max_bytes, **options):
+        removed, total = trim_thumbnails(max_bytes)
+        self.stdout.write(
+            f'Удалено вариантов: {removed}, размер кеша: {total} байт.'
+        )
@@ -0,0 +1,88 @@
+import posixpath
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .models import Post
+from .thumbnails import delete_thumbnails
+
+
+def referenced_images(names):
+    """Те из имён names, на которые ссылается хотя бы один пост."""
+    return set(
+        Post.objects.filter(image__in=names).values_list('image', flat=True)
+    )
+
+
+def release_images(*names):
+    """Удаляет фото, на которые больше не ссылается ни один пост.
+
+    Счётчиком ссылок служит число постов с этим фото, поэтому вызывать
+    функцию нужно после записи, убравшей ссылку, — например, в on_commit.
+    Файлы моложе MEDIA_RELEASE_MIN_AGE не удаляются: такую же загрузку
+    хранилище могло только что отдать посту, который ещё не сохранён
+    (ContentAddressedStorage обновляет время изменения файла). Их
+    позже удалит sweep_images.
+    """
+    names = {name for name in names if name}
+    if not names:
+        return set()
+    newer_than = timezone.now() - timedelta(
+        seconds=getattr(settings, 'MEDIA_RELEASE_MIN_AGE', 10 * 60)
+    )
+    released = set(_unreferenced(list(names), newer_than))
+    for name in released:
+        default_storage.delete(name)
+        delete_thumbnails(name)
+    return released
+
+
+def stored_images(directory=None):
+    """Имена всех файлов в каталоге фото постов и его подкаталогах."""
+    if directory is None:
+        directory = Post.image.field.upload_to
+    try:
+        subdirectories, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in files:
+        yield posixpath.join(directory, name)
+    for subdirectory in subdirectories:
+        yield from stored_images(posixpath.join(directory, subdirectory))
+
+
+def unreferenced_images(batch_size=500, min_age=None):
+    """Пачки файлов фото, на которые не ссылается ни один пост.
+
+    Файлы моложе min_age пропускаются: их пост может быть ещё
+    не сохранён.
+    """
+    newer_than = timezone.now() - min_age if min_age is not None else None
+    batch = []
+    for name in stored_images():
+        batch.append(name)
+        if len(batch) >= batch_size:
+            yield _unreferenced(batch, newer_than)
+            batch = []
+    if batch:
+        yield _unreferenced(batch, newer_than)
+
+
+def _unreferenced(batch, newer_than):
+    referenced = referenced_images(batch)
+    return [
+        name for name in batch
+        if name not in referenced and (
+            newer_than is None or _modified_before(name, newer_than)
+        )
+    ]
+
+
+def _modified_before(name, moment):
+    try:
+        return default_storage.get_modified_time(name) < moment
+    except FileNotFoundError:
+        # Файл уже удалён — удалять нечего.
+        return False
@@ -0,0 +1,18 @@
+# Сгенерировано Django 5.2.18 от 2026-10-18 20:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0, editable=False, help_text='Метка последнего изменения поста или его счётчиков.', verbose_name='Версия'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Сгенерировано Django 5.2.18 от 2026-10-18 21:05
+
+from django.db import migrations
+
+# Индекс FTS5 с внешним содержимым: текст хранится только в blog_post,
+# а триггеры поддерживают индекс при любой записи, включая bulk_create
+# и QuerySet.update. Префиксные индексы ускоряют поиск по началу слова.
+#
+# Django на SQLite выполняет многие AlterField/AddField для blog_post
+# пересозданием таблицы, а с ней удаляются и эти триггеры. Миграция,
+# которая пересоздаёт blog_post, должна следом восстановить триггеры
+# и перестроить индекс, как 0013_restore_post_search_triggers.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE blog_post_search USING fts5(
+        title, text,
+        content='blog_post', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER blog_post_search_insert AFTER INSERT ON blog_post BEGIN
+        INSERT INTO blog_post_search(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER blog_post_search_delete AFTER DELETE ON blog_post BEGIN
+        INSERT INTO blog_post_search(blog_post_search, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER blog_post_search_update
+    AFTER UPDATE OF title, text ON blog_post BEGIN
+        INSERT INTO blog_post_search(blog_post_search, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+        INSERT INTO blog_post_search(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END
+    """,
+    # Совпадение в заголовке весит больше совпадения в тексте.
+    "INSERT INTO blog_post_search(blog_post_search, rank)"
+    " VALUES ('rank', 'bm25(10.0, 1.0)')",
+    "INSERT INTO blog_post_search(blog_post_search) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS blog_post_search_update',
+    'DROP TRIGGER IF EXISTS blog_post_search_delete',
+    'DROP TRIGGER IF EXISTS blog_post_search_insert',
+    'DROP TABLE IF EXISTS blog_post_search',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_post_version'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_SQL, DROP_SQL),
+    ]
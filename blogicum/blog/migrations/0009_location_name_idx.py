@@ -0,0 +1,18 @@
+# Сгенерировано Django 5.2.18 от 2026-10-18 21:40
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_post_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='location',
+            index=models.Index(django.db.models.functions.comparison.Collate('name', 'NOCASE'), name='location_name_nocase_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Сгенерировано Django 5.2.18 от 2026-10-18 21:55
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_location_name_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(django.db.models.functions.comparison.Collate('title', 'NOCASE'), name='category_title_nocase_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Сгенерировано Django 5.2.18 от 2026-10-18 22:20
+
+from django.db import migrations, models
+
+
+def fill_image_size(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    batch = []
+    for post in Post.objects.exclude(image='').only('image').iterator():
+        try:
+            post.image_size = f'{post.image.width}x{post.image.height}'
+        except (OSError, ValueError):
+            continue
+        batch.append(post)
+        if len(batch) >= 500:
+            Post.objects.bulk_update(batch, ['image_size'])
+            batch = []
+    Post.objects.bulk_update(batch, ['image_size'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_category_title_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_size',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Ширина и высота фото в пикселях: «ШxВ».', max_length=32, verbose_name='Размер фото'),
+        ),
+        migrations.RunPython(fill_image_size, migrations.RunPython.noop),
+    ]
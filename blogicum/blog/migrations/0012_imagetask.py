@@ -0,0 +1,33 @@
+# Сгенерировано Django 5.2.18 от 2026-10-18 22:45
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0011_post_image_size'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image_name', models.CharField(help_text='Имя загруженного файла, который нужно обработать.', max_length=255, verbose_name='Файл')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает'), ('processing', 'Обрабатывается'), ('done', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=16, verbose_name='Статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, help_text='Повторная попытка откладывается после ошибки.', verbose_name='Не раньше')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Изменено')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_tasks', to='blog.post', verbose_name='Публикация')),
+            ],
+            options={
+                'verbose_name': 'обработка фото',
+                'verbose_name_plural': 'Обработка фото',
+                'indexes': [models.Index(fields=['status', 'run_after'], name='imagetask_queue_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Сгенерировано Django 5.2.18 от 2026-10-18 23:40
+
+from django.db import migrations
+
+# AddField в 0011 на SQLite пересоздаёт таблицу blog_post, и вместе
+# со старой таблицей пропадают триггеры индекса из 0008: новые и
+# изменённые посты переставали попадать в поиск. Триггеры создаются
+# заново, индекс перестраивается по текущему содержимому.
+TRIGGERS_SQL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS blog_post_search_insert
+    AFTER INSERT ON blog_post BEGIN
+        INSERT INTO blog_post_search(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS blog_post_search_delete
+    AFTER DELETE ON blog_post BEGIN
+        INSERT INTO blog_post_search(blog_post_search, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS blog_post_search_update
+    AFTER UPDATE OF title, text ON blog_post BEGIN
+        INSERT INTO blog_post_search(blog_post_search, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+        INSERT INTO blog_post_search(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END
+    """,
+    "INSERT INTO blog_post_search(blog_post_search) VALUES ('rebuild')",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_imagetask'),
+    ]
+
+    operations = [
+        migrations.RunSQL(TRIGGERS_SQL, migrations.RunSQL.noop),
+    ]
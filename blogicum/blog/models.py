@@ -1,5 +1,10 @@
+import time
+
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Collate
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -32,10 +37,34 @@ class Category(TimeStampedModel):
         verbose_name = 'категория'
         verbose_name_plural = 'Категории'
         ordering = ('title',)
+        indexes = (
+            # Подсказки в форме поста: title LIKE 'начало%'.
+            models.Index(
+                Collate('title', 'NOCASE'), name='category_title_nocase_idx'
+            ),
+        )
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        was_published = None
+        if self.pk:
+            was_published = Category.objects.filter(pk=self.pk).values_list(
+                'is_published', flat=True
+            ).first()
+        super().save(*args, **kwargs)
+        if was_published is not None and was_published != self.is_published:
+            # Переключение публикации категории меняет видимость всех её
+            # постов — пересчитываем visible_from одним UPDATE.
+            posts = Post.objects.filter(category=self)
+            if self.is_published:
+                posts.filter(is_published=True).update(
+                    visible_from=F('pub_date')
+                )
+            else:
+                posts.update(visible_from=None)
+
 
 class Location(TimeStampedModel):
     name = models.CharField(max_length=256, verbose_name='Название места')
@@ -44,11 +73,70 @@ class Location(TimeStampedModel):
         verbose_name = 'местоположение'
         verbose_name_plural = 'Местоположения'
         ordering = ('name',)
+        indexes = (
+            # Автодополнение в админке: name LIKE 'начало%' без учёта
+            # регистра читается из индекса только с collation NOCASE.
+            models.Index(
+                Collate('name', 'NOCASE'), name='location_name_nocase_idx'
+            ),
+        )
 
     def __str__(self):
         return self.name
 
 
+def new_version():
+    """Версия поста: растёт с каждым изменением и не повторяется."""
+    return time.time_ns()
+
+
+# Поля, от которых зависит visible_from.
+VISIBILITY_FIELDS = frozenset(('is_published', 'pub_date', 'category'))
+
+
+class PostQuerySet(models.QuerySet):
+
+    def published(self):
+        """Посты, видимые всем: одно условие по индексу visible_from."""
+        return self.filter(visible_from__lte=timezone.now())
+
+    def refresh_visible_from(self):
+        """Пересчитывает visible_from для выбранных постов."""
+        self.filter(
+            Q(is_published=False)
+            | Q(category__isnull=True)
+            | Q(category__is_published=False)
+        ).update(visible_from=None)
+        self.filter(
+            is_published=True, category__is_published=True
+        ).update(visible_from=F('pub_date'))
+
+    def update(self, **kwargs):
+        """UPDATE, после которого visible_from остаётся согласованным.
+
+        Если меняются поля видимости, первичные ключи выбираются заранее:
+        после UPDATE фильтр запроса может уже не совпадать с этими
+        постами (filter(is_published=True).update(is_published=False)).
+        """
+        fields = {
+            self.model._meta.get_field(name).name for name in kwargs
+        }
+        if not fields & VISIBILITY_FIELDS:
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            pks = list(self.values_list('pk', flat=True))
+            updated = super().update(**kwargs)
+            self.model.objects.using(self.db).filter(
+                pk__in=pks
+            ).refresh_visible_from()
+        return updated
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            delete_comments(self.values_list('pk', flat=True), self.db)
+            return super().delete()
+
+
 class Post(TimeStampedModel):
     title = models.CharField(max_length=256, verbose_name='Заголовок')
     text = models.TextField(verbose_name='Текст')
@@ -79,15 +167,127 @@ class Post(TimeStampedModel):
         verbose_name='Категория'
     )
     image = models.ImageField(upload_to='posts', blank=True, verbose_name='Фото')
+    image_size = models.CharField(
+        max_length=32,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name='Размер фото',
+        help_text='Ширина и высота фото в пикселях: «ШxВ».'
+    )
+    visible_from = models.DateTimeField(
+        null=True,
+        editable=False,
+        verbose_name='Виден с',
+        help_text='Совпадает с датой публикации, если пост и его категория '
+                  'опубликованы; иначе пусто.'
+    )
+
+    version = models.PositiveBigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Версия',
+        help_text='Метка последнего изменения поста или его счётчиков.'
+    )
+    comment_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество комментариев'
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'публикация'
         verbose_name_plural = 'Публикации'
         ordering = ('-pub_date',)
+        indexes = (
+            # Главная лента: visible_from <= now ORDER BY visible_from, id.
+            models.Index(
+                fields=('visible_from', 'id'), name='post_visible_from_idx'
+            ),
+            # Лента категории: category_id = ? + тот же диапазон и порядок.
+            models.Index(
+                fields=('category', 'visible_from', 'id'),
+                name='post_category_visible_idx'
+            ),
+            # Профиль: все посты автора ORDER BY pub_date, id.
+            models.Index(
+                fields=('author', 'pub_date', 'id'),
+                name='post_author_pub_date_idx'
+            ),
+        )
 
     def __str__(self):
         return self.title
 
+    def get_visible_from(self):
+        """Единое правило публичной видимости поста."""
+        if (
+            self.is_published
+            and self.category is not None
+            and self.category.is_published
+        ):
+            return self.pub_date
+        return None
+
+    @property
+    def is_visible(self):
+        return (
+            self.visible_from is not None
+            and self.visible_from <= timezone.now()
+        )
+
+    def get_image_size(self):
+        """Размер фото «ШxВ»; пусто, если фото нет или оно не читается."""
+        if not self.image:
+            return ''
+        try:
+            return f'{self.image.width}x{self.image.height}'
+        except (OSError, ValueError):
+            return ''
+
+    @property
+    def image_dimensions(self):
+        """(ширина, высота) фото по сохранённому размеру или None."""
+        try:
+            width, height = map(int, self.image_size.split('x'))
+        except ValueError:
+            return None
+        return width, height
+
+    def save(self, *args, **kwargs):
+        self.visible_from = self.get_visible_from()
+        if not self.image or not self.image._committed or not self.image_size:
+            self.image_size = self.get_image_size()
+        self.version = new_version()
+        update_fields = kwargs.get('update_fields')
+        if (
+            update_fields is None
+            and not kwargs.get('force_insert')
+            and self.pk is not None
+            and not self._state.adding
+        ):
+            # Счётчик комментариев меняется только атомарным UPDATE —
+            # не затираем его значением из устаревшего экземпляра.
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'comment_count'
+            ]
+        if update_fields is not None:
+            # visible_from и version вычислены выше и сохраняются при
+            # любом наборе полей: по версии строится ключ карточки поста.
+            kwargs['update_fields'] = {
+                *update_fields, 'visible_from', 'version'
+            }
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using') or self._state.db
+        with transaction.atomic(using=using):
+            delete_comments([self.pk], using)
+            return super().delete(*args, **kwargs)
+
 
 class Comment(TimeStampedModel):
     text = models.TextField(verbose_name='Текст комментария')
@@ -108,6 +308,87 @@ class Comment(TimeStampedModel):
         verbose_name = 'комментарий'
         verbose_name_plural = 'Комментарии'
         ordering = ('created_at',)
+        indexes = (
+            # Комментарии поста: post_id = ? ORDER BY created_at, id.
+            models.Index(
+                fields=('post', 'created_at', 'id'),
+                name='comment_post_created_idx'
+            ),
+        )
 
     def __str__(self):
         return f'Комментарий {self.author.username} к посту {self.post.title}'
+
+
+def delete_comments(post_ids, using):
+    """Удаляет комментарии постов перед удалением самих постов.
+
+    Каскад Django загрузил бы комментарии и удалял их пачками с сигналом
+    на каждый — число запросов росло бы с числом комментариев. Здесь на
+    пачку постов один DELETE без сигналов: обработчики удаления
+    комментария лишь сбрасывают страницы поста, а их сбрасывает
+    pre_delete самого поста.
+    """
+    connection = connections[using]
+    table = connection.ops.quote_name(Comment._meta.db_table)
+    column = connection.ops.quote_name(Comment._meta.get_field('post').column)
+    post_ids = list(post_ids)
+    with connection.cursor() as cursor:
+        for start in range(0, len(post_ids), 500):
+            chunk = post_ids[start:start + 500]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(
+                f'DELETE FROM {table} WHERE {column} IN ({placeholders})',
+                chunk,
+            )
+
+
+class ImageTask(models.Model):
+    """Задача фоновой обработки загруженного фото поста."""
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Ожидает'
+        PROCESSING = 'processing', 'Обрабатывается'
+        DONE = 'done', 'Готово'
+        FAILED = 'failed', 'Ошибка'
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='image_tasks',
+        verbose_name='Публикация'
+    )
+    image_name = models.CharField(
+        max_length=255,
+        verbose_name='Файл',
+        help_text='Имя загруженного файла, который нужно обработать.'
+    )
+    status = models.CharField(
+        max_length=16,
+        choices=Status.choices,
+        default=Status.PENDING,
+        verbose_name='Статус'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0, verbose_name='Попыток'
+    )
+    run_after = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Не раньше',
+        help_text='Повторная попытка откладывается после ошибки.'
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Изменено')
+    last_error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+
+    class Meta:
+        verbose_name = 'обработка фото'
+        verbose_name_plural = 'Обработка фото'
+        indexes = (
+            # Выбор очередной задачи: status = 'pending' AND run_after <= now.
+            models.Index(
+                fields=('status', 'run_after'), name='imagetask_queue_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.image_name}: {self.get_status_display()}'
@@ -0,0 +1,169 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers
+)
+from django.utils.http import http_date, quote_etag
+
+from .schedule import cap_timeout, release_due_posts
+
+# Метка, от которой зависят все страницы: справочники (категории,
+# местоположения) отображаются почти везде.
+REFERENCE_TAG = 'reference'
+
+
+def _tag_key(tag):
+    return f'page-tag:{tag}'
+
+
+def get_tag_versions(tags):
+    """Текущие версии меток; отсутствующие метки заводятся заново.
+
+    Версия — время последнего сброса метки в наносекундах. Поэтому
+    вытесненная из кеша метка не вернёт к жизни страницы, собранные
+    до её сброса, а по версиям можно судить о времени изменения.
+    """
+    keys = [_tag_key(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def invalidate_tags(*tags):
+    """Сбрасывает все страницы, зависящие от любой из меток.
+
+    Повторный сброс после коммита не даёт странице, собранной
+    параллельным запросом из ещё не закоммиченных данных, пережить его.
+    """
+    _bump_tags(tags)
+    transaction.on_commit(lambda: _bump_tags(tags))
+
+
+def _bump_tags(tags):
+    keys = [_tag_key(tag) for tag in tags]
+    current = cache.get_many(keys)
+    now = time.time_ns()
+    cache.set_many({
+        key: max(now, current.get(key, 0) + 1) for key in keys
+    }, None)
+
+
+def page_tags(tag_templates, view_kwargs):
+    return [REFERENCE_TAG] + [
+        template.format(**view_kwargs) for template in tag_templates
+    ]
+
+
+def page_cache_key(request, tags):
+    versions = get_tag_versions(tags)
+    raw = '|'.join([
+        request.path,
+        request.GET.get('page', ''),
+        request.GET.get('cursor', ''),
+        *(f'{tag}={version}' for tag, version in zip(tags, versions)),
+    ])
+    return f'page:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def cache_anonymous_page(*tag_templates):
+    """Кеширует страницу для анонимных GET-запросов.
+
+    Метки — шаблоны, подставляемые из аргументов view, например
+    'post:{post_id}'. Ключ страницы строится из пути, номера или
+    курсора страницы и версий меток, поэтому invalidate_tags
+    сбрасывает ровно зависящие от метки страницы.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (
+                request.method not in ('GET', 'HEAD')
+                or request.user.is_authenticated
+            ):
+                return view(request, *args, **kwargs)
+            release_due_posts()
+            key = page_cache_key(request, page_tags(tag_templates, kwargs))
+            response = cache.get(key)
+            if response is not None:
+                return response
+            response = view(request, *args, **kwargs)
+            if (
+                response.status_code == 200
+                and not response.cookies
+                and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+            ):
+                cache.set(key, response, cap_timeout(
+                    getattr(settings, 'PAGE_CACHE_TIMEOUT', 300)
+                ))
+            return response
+        return wrapper
+    return decorator
+
+
+def conditional_page(*tag_templates, max_age=0):
+    """Условный GET по версиям меток страницы.
+
+    ETag и Last-Modified вычисляются из пути, номера или курсора
+    страницы, версий меток и текущего пользователя — без запроса к постам,
+    поэтому на неизменившуюся страницу сразу отвечаем 304. Анонимам
+    разрешаем общий кеш на max_age секунд (не дольше, чем до следующей
+    отложенной публикации), остальным — только личный
+    с обязательной перепроверкой.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            release_due_posts()
+            tags = page_tags(tag_templates, kwargs)
+            versions = get_tag_versions(tags)
+            user = request.user
+            raw = '|'.join(map(str, [
+                request.path,
+                request.GET.get('page', ''),
+                request.GET.get('cursor', ''),
+                # Имя пользователя выводится в шапке страницы.
+                user.pk if user.is_authenticated else '',
+                user.username if user.is_authenticated else '',
+                *versions,
+            ]))
+            etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+            last_modified = max(versions) // 10 ** 9
+            # Страница с сообщением (например, об ошибке отправки
+            # комментария) отрисовывается заново и не получает ETag:
+            # иначе сообщение не показали бы или показали бы повторно.
+            if get_messages(request):
+                response = view(request, *args, **kwargs)
+                patch_cache_control(response, private=True, no_store=True)
+                return response
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response.headers['ETag'] = etag
+                response.headers['Last-Modified'] = http_date(last_modified)
+            if user.is_authenticated:
+                patch_cache_control(response, private=True, no_cache=True)
+            else:
+                # Общие кеши не должны держать страницу дольше момента
+                # следующей отложенной публикации.
+                patch_cache_control(
+                    response, public=True,
+                    max_age=min(max_age, cap_timeout(max_age)),
+                )
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
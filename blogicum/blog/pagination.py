@@ -0,0 +1,254 @@
+import json
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .schedule import cap_timeout, release_due_posts
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(direction, values):
+    """Упаковывает направление и значения ключа в непрозрачный токен."""
+    payload = json.dumps([direction, *values], default=str)
+    return urlsafe_base64_encode(payload.encode())
+
+
+def decode_cursor(token):
+    """Распаковывает токен; для битого токена возвращает None."""
+    try:
+        direction, *values = json.loads(
+            force_str(urlsafe_base64_decode(token))
+        )
+    except (ValueError, TypeError):
+        return None
+    if direction not in (NEXT, PREVIOUS):
+        return None
+    return direction, values
+
+
+class CursorPage:
+    """Страница keyset-пагинации, совместимая с шаблонами по интерфейсу."""
+
+    is_cursor_page = True
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Keyset-пагинация по составному ключу, например (pub_date, id).
+
+    Вместо OFFSET каждая страница выбирается условием «строго после
+    (или до) ключа граничной записи», поэтому глубокие страницы стоят
+    столько же, сколько первая.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.ordering = ordering
+        self.fields = [name.lstrip('-') for name in ordering]
+        self.descending = ordering[0].startswith('-')
+        model = object_list.model
+        self.model_fields = [model._meta.get_field(f) for f in self.fields]
+
+    def _key(self, obj):
+        return [getattr(obj, field) for field in self.fields]
+
+    def _parse_values(self, values):
+        if len(values) != len(self.fields):
+            return None
+        try:
+            return [
+                field.to_python(value)
+                for field, value in zip(self.model_fields, values)
+            ]
+        except Exception:
+            return None
+
+    def _seek(self, values, forward):
+        """Условие «после ключа» в направлении обхода ленты."""
+        lookup = 'lt' if forward == self.descending else 'gt'
+        conditions = []
+        for i, field in enumerate(self.fields):
+            equal = dict(zip(self.fields[:i], values[:i]))
+            equal[f'{field}__{lookup}'] = values[i]
+            conditions.append(Q(**equal))
+        return reduce(or_, conditions)
+
+    def _reversed_ordering(self):
+        return [
+            name[1:] if name.startswith('-') else f'-{name}'
+            for name in self.ordering
+        ]
+
+    def get_page(self, cursor=None):
+        """Возвращает страницу после/до токена; без токена — первую."""
+        decoded = decode_cursor(cursor) if cursor else None
+        values = self._parse_values(decoded[1]) if decoded else None
+        if values is None:
+            rows = list(
+                self.object_list.order_by(*self.ordering)[:self.per_page + 1]
+            )
+            has_more, rows = len(rows) > self.per_page, rows[:self.per_page]
+            return self._build_page(rows, has_next=has_more, has_prev=False)
+
+        forward = decoded[0] == NEXT
+        queryset = self.object_list.filter(self._seek(values, forward))
+        if forward:
+            queryset = queryset.order_by(*self.ordering)
+        else:
+            queryset = queryset.order_by(*self._reversed_ordering())
+        rows = list(queryset[:self.per_page + 1])
+        has_more, rows = len(rows) > self.per_page, rows[:self.per_page]
+        if forward:
+            return self._build_page(rows, has_next=has_more, has_prev=True)
+        rows.reverse()
+        return self._build_page(rows, has_next=True, has_prev=has_more)
+
+    def _build_page(self, rows, has_next, has_prev):
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = encode_cursor(NEXT, self._key(rows[-1]))
+        if rows and has_prev:
+            previous_cursor = encode_cursor(PREVIOUS, self._key(rows[0]))
+        return CursorPage(rows, next_cursor, previous_cursor)
+
+
+def feed_count_key(feed):
+    """Ключ кеша числа постов в ленте: 'index', 'category:<id>', ..."""
+    return f'feed-count:{feed}'
+
+
+def invalidate_feed_counts(*feeds):
+    cache.delete_many([feed_count_key(feed) for feed in feeds])
+
+
+class CachedCountPage(Page):
+
+    def __init__(self, object_list, number, paginator, has_next=None):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        if self._has_next is not None:
+            return self._has_next
+        return super().has_next()
+
+    @property
+    def page_range(self):
+        if self.paginator.count_is_exact:
+            return self.paginator.get_elided_page_range(self.number)
+        # Без точного числа страниц показываем только соседей текущей.
+        last = self.number + 1 if self.has_next() else self.number
+        return range(max(1, self.number - 2), last + 1)
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator с кешируемым и ограниченным сверху подсчётом строк.
+
+    Число постов ленты хранится в кеше под ключом feed_count_key(feed)
+    и сбрасывается при записи постов. Считается не больше count_limit
+    строк: если их больше, count — лишь нижняя оценка, а наличие
+    следующей страницы проверяется выборкой одной лишней строки.
+    """
+
+    def __init__(self, object_list, per_page, feed=None, count_limit=None,
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.feed = feed
+        if count_limit is None:
+            count_limit = getattr(settings, 'POSTS_COUNT_LIMIT', None)
+        self.count_limit = count_limit
+
+    @cached_property
+    def _count_info(self):
+        key = feed_count_key(self.feed) if self.feed else None
+        if key:
+            release_due_posts()
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+        queryset = self.object_list.order_by()
+        if self.count_limit:
+            count = queryset[:self.count_limit + 1].count()
+            info = (count, count <= self.count_limit)
+        else:
+            info = (queryset.count(), True)
+        if key:
+            cache.set(key, info, cap_timeout(
+                getattr(settings, 'POSTS_COUNT_CACHE_TIMEOUT', 60)
+            ))
+        return info
+
+    @cached_property
+    def count(self):
+        return self._count_info[0]
+
+    @property
+    def count_is_exact(self):
+        return self._count_info[1]
+
+    def validate_number(self, number):
+        if self.count_is_exact:
+            return super().validate_number(number)
+        # Конец ленты неизвестен — проверяем только, что номер корректен.
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы не является целым числом')
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1')
+        return number
+
+    def page(self, number):
+        if self.count_is_exact:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('Страница не содержит результатов')
+        return self._get_page(
+            rows[:self.per_page], number, self,
+            has_next=len(rows) > self.per_page
+        )
+
+    def get_page(self, number):
+        try:
+            return super().get_page(number)
+        except EmptyPage:
+            # Номер оказался дальше конца ленты, оценённой снизу.
+            return self.page(self.num_pages)
+
+    def _get_page(self, *args, **kwargs):
+        return CachedCountPage(*args, **kwargs)
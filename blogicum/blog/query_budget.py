@@ -0,0 +1,71 @@
+import logging
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(max_queries):
+    """Объявляет, сколько SQL-запросов допускает один запрос к view.
+
+    В бюджет входит весь цикл запроса: сессия, пользователь, сам view
+    и отрисовка шаблона. Декоратор можно повесить и на CBV — бюджет
+    станет атрибутом класса.
+    """
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def get_query_budget(view_func):
+    budget = getattr(view_func, 'query_budget', None)
+    if budget is None:
+        view_class = getattr(view_func, 'view_class', None)
+        budget = getattr(view_class, 'query_budget', None)
+    return budget
+
+
+class QueryCounter:
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class QueryBudgetMiddleware:
+    """Считает SQL-запросы и сверяет их число с бюджетом view.
+
+    При QUERY_BUDGET_RAISE превышение бюджета — исключение, иначе
+    предупреждение в лог.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.query_budget = None
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        budget = request.query_budget
+        if budget is not None and counter.count > budget:
+            message = (
+                f'{request.method} {request.path}: {counter.count} '
+                f'SQL-запросов при бюджете {budget}'
+            )
+            if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_query_budget(view_func)
@@ -0,0 +1,79 @@
+import threading
+
+from django.conf import settings
+
+from .models import Category
+from .page_cache import get_tag_versions
+
+# Поля, по которым в справочнике ищут строку помимо pk.
+INDEXED_FIELDS = {
+    Category: ('slug',),
+}
+
+_lock = threading.Lock()
+_tables = {}
+
+
+def reference_tag(model):
+    """Метка, сбрасываемая при записи строк справочника model."""
+    return f'reference:{model._meta.model_name}'
+
+
+class ReferenceTable:
+    """Снимок справочника в памяти процесса; экземпляры не изменять."""
+
+    def __init__(self, model, version, rows, complete=True):
+        self.version = version
+        self.complete = complete
+        self.rows = tuple(rows) if complete else ()
+        self.by_field = {
+            field: {getattr(row, field): row for row in self.rows}
+            for field in ('pk', *INDEXED_FIELDS.get(model, ()))
+        }
+
+    def get(self, field, value):
+        return self.by_field[field].get(value)
+
+
+def get_table(model):
+    """Справочник model из памяти процесса или None, если он велик.
+
+    Снимок сверяется с версией метки reference_tag(model) в кеше
+    default, поэтому запись сбрасывает снимки во всех процессах, если
+    этот кеш у них общий (файловый в settings.CACHES); с LocMemCache —
+    только в процессе, где была запись.
+    В память берутся только таблицы не больше REFERENCE_CACHE_MAX_ROWS
+    строк; для больших вызывающий код идёт в базу сам.
+    """
+    version, = get_tag_versions([reference_tag(model)])
+    table = _tables.get(model)
+    if table is None or table.version != version:
+        with _lock:
+            table = _tables.get(model)
+            if table is None or table.version != version:
+                limit = getattr(settings, 'REFERENCE_CACHE_MAX_ROWS', 1000)
+                rows = list(model._default_manager.all()[:limit + 1])
+                table = ReferenceTable(
+                    model, version, rows, complete=len(rows) <= limit
+                )
+                _tables[model] = table
+    return table if table.complete else None
+
+
+def get_reference(model, field, value, **filters):
+    """Строка справочника по значению поля или None.
+
+    filters — дополнительные условия на значения полей, например
+    is_published=True; без снимка в памяти строка читается из базы.
+    """
+    table = get_table(model)
+    if table is None:
+        return model._default_manager.filter(
+            **{field: value}, **filters
+        ).first()
+    row = table.get(field, value)
+    if row is None or any(
+        getattr(row, name) != expected for name, expected in filters.items()
+    ):
+        return None
+    return row
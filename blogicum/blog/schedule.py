@@ -0,0 +1,103 @@
+import math
+
+from django.core.cache import cache
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import Post
+
+NEXT_PUBLICATION_KEY = 'schedule:next-publication'
+RELEASED_UNTIL_KEY = 'schedule:released-until'
+
+# Отправляется для каждого отложенного поста, ставшего видимым всем.
+# Аргументы: post_id, category_id, author_id, category_slug, username.
+post_published = Signal()
+
+# Отправляется, когда отметка released_until пропала из кеша: какие
+# публикации уже разосланы, неизвестно, и сбросить нужно все страницы.
+publications_reset = Signal()
+
+
+def released_until():
+    """Момент, до которого включительно публикации уже разосланы.
+
+    Отметка хранится в кеше без срока. Если её нет (кеш очищен или
+    запись вытеснена), она начинается с текущего момента, а страницы
+    сбрасываются сигналом publications_reset.
+    """
+    moment = cache.get(RELEASED_UNTIL_KEY)
+    if moment is None:
+        moment = timezone.now()
+        if cache.add(RELEASED_UNTIL_KEY, moment, None):
+            publications_reset.send(sender=Post)
+        else:
+            moment = cache.get(RELEASED_UNTIL_KEY, moment)
+    return moment
+
+
+def next_publication():
+    """Ближайший момент публикации, ещё не разосланной post_published.
+
+    Отсчитывается от released_until(), а не от текущего времени: пост,
+    чей момент наступил, остаётся «следующим», пока release_due_posts
+    его не разошлёт, даже если ключ сбросила запись постов или
+    категорий. Значение хранится в кеше до следующей такой записи;
+    None — запланированных публикаций нет.
+    """
+    cached = cache.get(NEXT_PUBLICATION_KEY)
+    if cached is None:
+        moment = Post.objects.filter(
+            visible_from__gt=released_until()
+        ).order_by('visible_from').values_list(
+            'visible_from', flat=True
+        ).first()
+        cached = (moment,)
+        cache.set(NEXT_PUBLICATION_KEY, cached, None)
+    return cached[0]
+
+
+def forget_next_publication():
+    cache.delete(NEXT_PUBLICATION_KEY)
+
+
+def cap_timeout(timeout):
+    """Ограничивает время жизни записи кеша моментом следующей публикации."""
+    moment = next_publication()
+    if moment is None:
+        return timeout
+    seconds = math.ceil((moment - timezone.now()).total_seconds())
+    return max(1, min(timeout, seconds))
+
+
+def release_due_posts():
+    """Рассылает post_published для постов, чьё время уже наступило.
+
+    Вызывается перед чтением кешей лент: первый же запрос после
+    момента публикации сбрасывает ровно затронутые ленты. Рассылаются
+    все посты между released_until() и текущим моментом, после чего
+    отметка сдвигается; повторная рассылка лишь лишний раз сбросит
+    ленты, а пропущенная оставила бы их устаревшими навсегда.
+    """
+    moment = next_publication()
+    now = timezone.now()
+    if moment is None or moment > now:
+        return
+    released = list(
+        Post.objects.filter(
+            visible_from__gt=released_until(), visible_from__lte=now
+        ).values_list(
+            'pk', 'category_id', 'author_id',
+            'category__slug', 'author__username'
+        )
+    )
+    cache.set(RELEASED_UNTIL_KEY, now, None)
+    forget_next_publication()
+    for post_id, category_id, author_id, category_slug, username in released:
+        post_published.send(
+            sender=Post,
+            post_id=post_id,
+            category_id=category_id,
+            author_id=author_id,
+            category_slug=category_slug,
+            username=username,
+        )
@@ -0,0 +1,138 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+from .pagination import (
+    NEXT, PREVIOUS, CursorPage, decode_cursor, encode_cursor
+)
+
+# Больше слов в запросе только замедляют поиск и почти не сужают выдачу.
+MAX_TERMS = 8
+
+# Маркеры подсветки, которые FTS5 вставляет вокруг найденных слов.
+MARK_START, MARK_END = '\x02', '\x03'
+
+SEARCH_SQL = """
+    SELECT blog_post_search.rowid, blog_post_search.rank,
+           highlight(blog_post_search, 0, char(2), char(3)),
+           snippet(blog_post_search, 1, char(2), char(3), '…', 24)
+    FROM blog_post_search
+    JOIN blog_post ON blog_post.id = blog_post_search.rowid
+    WHERE blog_post_search MATCH %s AND blog_post.visible_from <= %s
+    {seek}
+    ORDER BY blog_post_search.rank {order}, blog_post_search.rowid {order}
+    LIMIT %s
+"""
+
+SEEK_SQL = """
+    AND (blog_post_search.rank {op} %s OR (
+        blog_post_search.rank = %s AND blog_post_search.rowid {op} %s
+    ))
+"""
+
+
+def match_expression(query):
+    """Запрос пользователя в синтаксисе FTS5 или None, если искать нечего.
+
+    Ищутся посты со всеми словами запроса, каждое — как начало слова.
+    Операторы FTS5 из ввода не пропускаются.
+    """
+    terms = re.findall(r'\w+', query.lower())[:MAX_TERMS]
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def filter_matching(queryset, query):
+    """Оставляет в QuerySet постов только найденные по запросу."""
+    expression = match_expression(query)
+    if expression is None:
+        return queryset.none()
+    return queryset.filter(id__in=RawSQL(
+        'SELECT rowid FROM blog_post_search'
+        ' WHERE blog_post_search MATCH %s',
+        (expression,)
+    ))
+
+
+def highlight(text):
+    """Экранирует фрагмент и заменяет маркеры FTS5 на <mark>."""
+    return mark_safe(
+        escape(text)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+class SearchPaginator:
+    """Видимые посты, найденные по запросу, — от самых релевантных.
+
+    Страницы выбираются по ключу (rank, id) без OFFSET, как в
+    CursorPaginator. У постов страницы есть атрибуты search_title
+    и search_snippet с подсвеченными совпадениями.
+    """
+
+    def __init__(self, query, per_page):
+        self.expression = match_expression(query)
+        self.per_page = per_page
+
+    def _fetch(self, values, forward):
+        order = 'ASC' if forward else 'DESC'
+        params = [
+            self.expression,
+            connection.ops.adapt_datetimefield_value(timezone.now()),
+        ]
+        seek = ''
+        if values is not None:
+            seek = SEEK_SQL.format(op='>' if forward else '<')
+            params += [values[0], values[0], values[1]]
+        sql = SEARCH_SQL.format(seek=seek, order=order)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [*params, self.per_page + 1])
+            return cursor.fetchall()
+
+    def _parse_values(self, values):
+        try:
+            rank, post_id = values
+            return [float(rank), int(post_id)]
+        except (TypeError, ValueError):
+            return None
+
+    def get_page(self, cursor=None):
+        """Возвращает страницу после/до токена; без токена — первую."""
+        if self.expression is None:
+            return CursorPage([])
+        decoded = decode_cursor(cursor) if cursor else None
+        values = self._parse_values(decoded[1]) if decoded else None
+        forward = values is None or decoded[0] == NEXT
+        rows = self._fetch(values, forward)
+        has_more, rows = len(rows) > self.per_page, rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+        posts = Post.objects.select_related(
+            'category', 'location', 'author'
+        ).in_bulk([row[0] for row in rows])
+        found = []
+        for post_id, rank, title, snippet in rows:
+            post = posts.get(post_id)
+            if post is None:
+                continue
+            post.search_title = highlight(title)
+            post.search_snippet = highlight(snippet)
+            found.append(post)
+        has_next, has_prev = (
+            (has_more, values is not None) if forward else (True, has_more)
+        )
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = encode_cursor(NEXT, [rows[-1][1], rows[-1][0]])
+        if rows and has_prev:
+            previous_cursor = encode_cursor(
+                PREVIOUS, [rows[0][1], rows[0][0]]
+            )
+        return CursorPage(found, next_cursor, previous_cursor)
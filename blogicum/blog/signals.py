@@ -0,0 +1,197 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (
+    post_delete, post_init, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from .media import release_images
+from .models import Category, Comment, Location, Post, new_version
+from .page_cache import REFERENCE_TAG, invalidate_tags
+from .pagination import invalidate_feed_counts
+from .reference import reference_tag
+from .schedule import (
+    forget_next_publication, post_published, publications_reset
+)
+
+User = get_user_model()
+
+
+def post_feeds(category_id, author_id):
+    """Ленты, в которые может попасть пост с такими категорией и автором."""
+    return ('index', f'category:{category_id}', f'author:{author_id}')
+
+
+def post_page_tags(post_id, category_slug, username):
+    """Метки закешированных страниц, на которых показан пост."""
+    return (
+        f'post:{post_id}',
+        'index',
+        f'category:{category_slug}',
+        f'author:{username}',
+    )
+
+
+def stored_post_page_tags(post_id):
+    row = Post.objects.filter(pk=post_id).values_list(
+        'category__slug', 'author__username'
+    ).first()
+    return post_page_tags(post_id, *row) if row else (f'post:{post_id}',)
+
+
+@receiver(pre_delete, sender=Category)
+def hide_posts_of_deleted_category(sender, instance, **kwargs):
+    """Посты удаляемой категории остаются без неё и перестают быть видны."""
+    instance.posts.update(visible_from=None)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def reset_category_caches(sender, instance, **kwargs):
+    invalidate_feed_counts('index', f'category:{instance.pk}')
+    invalidate_tags(REFERENCE_TAG, reference_tag(Category))
+    forget_next_publication()
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def reset_location_caches(sender, instance, **kwargs):
+    invalidate_tags(REFERENCE_TAG, reference_tag(Location))
+
+
+# Поля пользователя, которые видны на страницах: имя — в карточках,
+# комментариях и адресе профиля, остальные — только в профиле.
+PROFILE_FIELDS = ('username', 'first_name', 'last_name', 'is_staff')
+
+
+def profile_values(user):
+    # __dict__, а не getattr: отложенное поле не должно стоить запроса.
+    return tuple(user.__dict__.get(field) for field in PROFILE_FIELDS)
+
+
+@receiver(post_init, sender=User)
+def remember_profile(sender, instance, **kwargs):
+    instance._stored_profile = profile_values(instance)
+
+
+def author_tags(user):
+    """Метки страниц, где показано имя автора: его посты и комментарии.
+
+    Версии его постов обновляются, чтобы сменились ключи карточек
+    во фрагментном кеше.
+    """
+    Post.objects.filter(author=user).update(version=new_version())
+    tags = {'index'}
+    for post_id, category_slug in Post.objects.filter(
+        author=user
+    ).values_list('pk', 'category__slug'):
+        tags.update((f'post:{post_id}', f'category:{category_slug}'))
+    tags.update(
+        f'post:{post_id}' for post_id in Comment.objects.filter(
+            author=user
+        ).values_list('post_id', flat=True).distinct()
+    )
+    return tags
+
+
+@receiver(post_save, sender=User)
+def reset_user_caches(sender, instance, created, **kwargs):
+    """Сбрасывает страницы, только если изменились видимые поля.
+
+    Вход (last_login) и смена пароля страниц не меняют. Правка имени
+    или роли сбрасывает профиль, смена username — ещё и все страницы
+    с постами и комментариями автора.
+    """
+    previous = instance.__dict__.get('_stored_profile')
+    current = instance._stored_profile = profile_values(instance)
+    if created or previous is None or previous == current:
+        return
+    tags = {f'author:{previous[0]}', f'author:{instance.username}'}
+    if previous[0] != instance.username:
+        tags |= author_tags(instance)
+    invalidate_tags(*tags)
+
+
+@receiver(pre_save, sender=Post)
+def reset_previous_post_caches(sender, instance, **kwargs):
+    """Пост мог сменить категорию или автора — сбрасываем и старые ленты."""
+    if instance.pk is None:
+        return
+    previous = Post.objects.filter(pk=instance.pk).values_list(
+        'category_id', 'author_id', 'category__slug', 'author__username',
+        'image',
+    ).first()
+    if previous is not None:
+        invalidate_feed_counts(*post_feeds(*previous[:2]))
+        invalidate_tags(*post_page_tags(instance.pk, *previous[2:4]))
+        # Прежнее фото освобождается в post_save, когда запись его уже
+        # не держит.
+        instance._stored_image = previous[4]
+
+
+@receiver(post_save, sender=Post)
+def reset_post_caches(sender, instance, **kwargs):
+    forget_next_publication()
+    invalidate_feed_counts(
+        *post_feeds(instance.category_id, instance.author_id)
+    )
+    invalidate_tags(*post_page_tags(
+        instance.pk,
+        instance.category.slug if instance.category_id else None,
+        instance.author.username,
+    ))
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, **kwargs):
+    stored_image = instance.__dict__.pop('_stored_image', '')
+    if stored_image and stored_image != instance.image.name:
+        transaction.on_commit(partial(release_images, stored_image))
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_post_image(sender, instance, **kwargs):
+    if instance.image:
+        transaction.on_commit(partial(release_images, instance.image.name))
+
+
+@receiver(pre_delete, sender=Post)
+def reset_deleted_post_caches(sender, instance, **kwargs):
+    forget_next_publication()
+    invalidate_feed_counts(
+        *post_feeds(instance.category_id, instance.author_id)
+    )
+    invalidate_tags(*stored_post_page_tags(instance.pk))
+
+
+@receiver(post_published, sender=Post)
+def reset_published_post_caches(sender, post_id, category_id, author_id,
+                                category_slug, username, **kwargs):
+    """Отложенный пост стал виден — сбрасываем ленты, где он появился."""
+    invalidate_feed_counts(*post_feeds(category_id, author_id))
+    invalidate_tags(*post_page_tags(post_id, category_slug, username))
+
+
+@receiver(publications_reset, sender=Post)
+def reset_all_pages(sender, **kwargs):
+    """Неизвестно, какие отложенные посты уже показаны, — сбрасываем всё."""
+    invalidate_tags(REFERENCE_TAG)
+
+
+@receiver(post_save, sender=Comment)
+def reset_comment_caches(sender, instance, created, **kwargs):
+    if created:
+        # Новый комментарий меняет счётчик в карточках лент.
+        invalidate_tags(*stored_post_page_tags(instance.post_id))
+    else:
+        invalidate_tags(f'post:{instance.post_id}')
+
+
+@receiver(post_delete, sender=Comment)
+def reset_deleted_comment_caches(sender, instance, origin=None, **kwargs):
+    # При удалении поста его страницы уже сброшены в pre_delete поста.
+    if isinstance(origin, Post):
+        return
+    invalidate_tags(*stored_post_page_tags(instance.post_id))
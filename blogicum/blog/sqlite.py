@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# PRAGMA для каждого нового соединения с SQLite. WAL пускает читателей
+# параллельно с писателем, synchronous=NORMAL в режиме WAL не теряет
+# целостность при сбое, busy_timeout заставляет ждать блокировку,
+# а не сразу падать с «database is locked».
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -20000,
+    'temp_store': 'MEMORY',
+}
+
+
+def sqlite_pragmas():
+    return getattr(settings, 'SQLITE_PRAGMAS', DEFAULT_PRAGMAS)
+
+
+def apply_pragmas(dbapi_connection, pragmas=None):
+    """Выполняет PRAGMA на соединении DB-API; возвращает их итог."""
+    if pragmas is None:
+        pragmas = sqlite_pragmas()
+    applied = {}
+    for name, value in pragmas.items():
+        row = dbapi_connection.execute(f'PRAGMA {name} = {value}').fetchone()
+        applied[name] = row[0] if row else value
+    return applied
+
+
+@receiver(connection_created)
+def tune_sqlite_connection(sender, connection, **kwargs):
+    # PRAGMA идут мимо обёрток курсора Django, чтобы не попадать
+    # в бюджет SQL-запросов view, при котором открылось соединение.
+    if connection.vendor == 'sqlite':
+        apply_pragmas(connection.connection)
@@ -0,0 +1,150 @@
+import gzip
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import require_safe
+
+from .query_budget import query_budget
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Текстовые форматы, которые имеет смысл сжимать; PNG и JPEG уже сжаты.
+COMPRESSIBLE = ('.css', '.js', '.svg', '.ico', '.json', '.txt', '.xml', '.map')
+
+# Кодировка → суффикс сжатой копии, в порядке предпочтения.
+ENCODINGS = {'br': '.br', 'gzip': '.gz'}
+
+# Имя, в которое ManifestStaticFilesStorage вписал хеш содержимого.
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^/.]+$')
+
+
+def compress(data):
+    """Сжатые копии data по кодировкам — только те, что меньше исходника."""
+    variants = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(data, quality=11)
+    return {
+        encoding: compressed for encoding, compressed in variants.items()
+        if len(compressed) < len(data)
+    }
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Статика с хешем содержимого в имени и сжатыми копиями рядом.
+
+    collectstatic пишет рядом с каждым текстовым файлом копии .gz и,
+    если установлен brotli, .br. Пока манифеста нет (collectstatic не
+    запускался), {% static %} отдаёт исходные имена файлов.
+    """
+
+    # Карты исходников не поставляются, а ссылка на отсутствующую карту
+    # (как в bootstrap.min.css) ломала бы collectstatic — такие ссылки
+    # остаются как есть.
+    patterns = tuple(
+        (extension, tuple(
+            pattern for pattern in extension_patterns
+            if 'sourceMappingURL' not in str(pattern)
+        ))
+        for extension, extension_patterns in (
+            ManifestStaticFilesStorage.patterns
+        )
+    )
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed_names = set()
+        for name, hashed_name, processed in super().post_process(
+            paths, dry_run, **options
+        ):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed_names.add(hashed_name)
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for hashed_name in sorted(hashed_names):
+            self.compress_file(hashed_name)
+
+    def compress_file(self, name):
+        if not name.endswith(COMPRESSIBLE):
+            return
+        with self.open(name) as original:
+            data = original.read()
+        for encoding, compressed in compress(data).items():
+            compressed_name = name + ENCODINGS[encoding]
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            self._save(compressed_name, ContentFile(compressed))
+
+
+def accepted_encodings(request):
+    """Кодировки из Accept-Encoding запроса, кроме явно запрещённых q=0."""
+    accepted = set()
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        encoding, _, params = part.partition(';')
+        quality = params.strip().removeprefix('q=')
+        try:
+            if params and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(encoding.strip().lower())
+    return accepted
+
+
+@query_budget(0)
+@require_safe
+def serve(request, path):
+    """Отдаёт собранную статику из STATIC_ROOT.
+
+    Если клиент принимает br или gzip и при сборке записана сжатая
+    копия, отдаётся она. Файлы с хешем в имени неизменны и кешируются
+    на год, остальные — на час.
+    """
+    if path.endswith(tuple(ENCODINGS.values())):
+        raise Http404
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+    content_type = (
+        mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    )
+    accepted = accepted_encodings(request)
+    for encoding, suffix in ENCODINGS.items():
+        if encoding in accepted and os.path.isfile(full_path + suffix):
+            response = FileResponse(
+                open(full_path + suffix, 'rb'),
+                content_type=content_type,
+                filename=os.path.basename(full_path),
+            )
+            response['Content-Encoding'] = encoding
+            break
+    else:
+        response = FileResponse(
+            open(full_path, 'rb'), content_type=content_type
+        )
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if HASHED_NAME.search(path):
+        patch_cache_control(
+            response, public=True, max_age=60 * 60 * 24 * 365, immutable=True
+        )
+    else:
+        patch_cache_control(response, public=True, max_age=60 * 60)
+    return response
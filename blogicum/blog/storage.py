@@ -0,0 +1,46 @@
+import hashlib
+import os
+import posixpath
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище, в котором имя файла — хеш его содержимого.
+
+    Одинаковые файлы, загруженные под разными именами, хранятся один
+    раз: от исходного имени остаются только каталог и расширение.
+    Файл может быть общим для нескольких записей, поэтому удалять его
+    нужно через blog.media.release_images, а не storage.delete.
+    """
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory, basename = posixpath.split(name)
+        extension = os.path.splitext(basename)[1].lower()
+        hexdigest = digest.hexdigest()
+        return posixpath.join(
+            directory, hexdigest[:2], hexdigest + extension
+        )
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        if self.exists(name):
+            # Свежая отметка времени защищает файл от sweep_images, пока
+            # ссылающийся на него пост ещё не сохранён.
+            os.utime(self.path(name))
+            return name
+        # Пишем под временным именем и переименовываем: параллельная
+        # загрузка того же файла не увидит его недописанным.
+        temp = super()._save(
+            posixpath.join(
+                posixpath.dirname(name), f'.{uuid.uuid4().hex}.tmp'
+            ),
+            content,
+        )
+        os.replace(self.path(temp), self.path(name))
+        return name
@@ -0,0 +1,59 @@
+from django import template
+from django.urls import reverse
+
+from blog.page_cache import REFERENCE_TAG, get_tag_versions
+from blog.thumbnails import variant_widths
+
+register = template.Library()
+
+
+@register.filter
+def card_version(post):
+    """Версия карточки поста для ключа фрагментного кеша.
+
+    Меняется с версией поста (сохранение, число комментариев, смена
+    имени автора), с публикацией его категории или местоположения,
+    а также при любой правке справочников.
+    """
+    category = post.category
+    location = post.location
+    return ':'.join(map(str, (
+        post.pk,
+        post.version,
+        category is not None and category.is_published,
+        location is not None and location.is_published,
+        *get_tag_versions([REFERENCE_TAG]),
+    )))
+
+
+@register.inclusion_tag('includes/post_picture.html')
+def post_picture(post, css_class='', sizes='(max-width: 40rem) 100vw, 40rem'):
+    """<picture> с вариантами фото поста в WebP и JPEG разной ширины.
+
+    Браузер сам выбирает вариант по sizes, а сохранённые ширина
+    и высота фото резервируют место под картинку до её загрузки.
+    """
+    width, height = post.image_dimensions or (None, None)
+    variants = variant_widths(width)
+
+    def url(requested, fmt):
+        return reverse(
+            'blog:thumbnail', args=[requested, fmt, post.image.name]
+        )
+
+    def srcset(fmt):
+        return ', '.join(
+            f'{url(requested, fmt)} {actual}w'
+            for requested, actual in variants
+        )
+
+    return {
+        'post': post,
+        'css_class': css_class,
+        'sizes': sizes,
+        'webp_srcset': srcset('webp'),
+        'jpeg_srcset': srcset('jpeg'),
+        'src': url(variants[len(variants) // 2][0], 'jpeg'),
+        'width': width,
+        'height': height,
+    }
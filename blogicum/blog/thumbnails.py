@@ -0,0 +1,121 @@
+import hashlib
+import itertools
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# Формат варианта → (формат Pillow, MIME-тип).
+FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+
+# Счётчик вариантов, созданных процессом; next() атомарен под GIL.
+_created = itertools.count(1)
+
+
+def thumbnail_widths():
+    return tuple(getattr(settings, 'THUMBNAIL_WIDTHS', (320, 640, 1280)))
+
+
+def thumbnail_root():
+    return Path(getattr(
+        settings, 'THUMBNAIL_ROOT', Path(settings.MEDIA_ROOT) / 'thumbnails'
+    ))
+
+
+def thumbnail_path(name, width, fmt):
+    digest = hashlib.md5(name.encode()).hexdigest()
+    return thumbnail_root() / digest[:2] / f'{digest}-{width}.{fmt}'
+
+
+def variant_widths(width=None):
+    """Пары (запрашиваемая, фактическая ширина) вариантов картинки.
+
+    Варианты не увеличивают оригинал шириной width, поэтому у узкой
+    картинки несколько запрашиваемых ширин дают один вариант.
+    """
+    variants = {}
+    for requested in sorted(thumbnail_widths()):
+        actual = requested if width is None else min(requested, width)
+        variants.setdefault(actual, requested)
+    return [(requested, actual) for actual, requested in variants.items()]
+
+
+def get_thumbnail(name, width, fmt):
+    """Путь к варианту картинки name шириной не больше width.
+
+    Вариант создаётся при первом запросе и дальше берётся с диска;
+    время изменения файла служит отметкой последнего использования
+    для вытеснения в trim_thumbnails.
+    """
+    path = thumbnail_path(name, width, fmt)
+    try:
+        os.utime(path)
+        return path
+    except FileNotFoundError:
+        pass
+    with default_storage.open(name) as source, Image.open(source) as image:
+        # JPEG декодируется сразу в уменьшенном масштабе, не меньше
+        # нужного по обеим сторонам (на случай поворота по EXIF).
+        image.draft(image.mode, (width, width))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((width, image.height), Image.LANCZOS)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Пишем во временный файл и подменяем атомарно: параллельный
+        # запрос не увидит недописанный вариант.
+        handle, temp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        with os.fdopen(handle, 'wb') as output:
+            image.save(output, FORMATS[fmt][0], quality=82, optimize=True)
+    os.replace(temp, path)
+    # Обход всего кеша дорог, поэтому запрос проверяет его размер лишь
+    # раз на THUMBNAIL_TRIM_EVERY созданных вариантов; между проверками
+    # кеш может немного превысить лимит. Регулярно кеш подрезает
+    # команда trim_thumbnails.
+    if next(_created) % getattr(settings, 'THUMBNAIL_TRIM_EVERY', 200) == 0:
+        trim_thumbnails()
+    return path
+
+
+def delete_thumbnails(name):
+    """Удаляет все варианты картинки name."""
+    for width in thumbnail_widths():
+        for fmt in FORMATS:
+            thumbnail_path(name, width, fmt).unlink(missing_ok=True)
+
+
+def trim_thumbnails(max_bytes=None):
+    """Удаляет давно не запрошенные варианты сверх лимита размера кеша.
+
+    Возвращает число удалённых файлов и размер кеша после очистки.
+    """
+    if max_bytes is None:
+        max_bytes = getattr(
+            settings, 'THUMBNAIL_CACHE_MAX_BYTES', 512 * 1024 * 1024
+        )
+    files = []
+    total = 0
+    for path in thumbnail_root().glob('*/*'):
+        if path.suffix[1:] not in FORMATS:
+            continue
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+    files.sort()
+    removed = 0
+    for _, size, path in files:
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+    return removed, total
@@ -6,14 +6,29 @@ app_name = 'blog'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('search/', views.search, name='search'),
+    path('compression/', views.compression, name='compression'),
 
     # Посты
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('posts/create/', views.create_post, name='create_post'),
     path('posts/<int:post_id>/edit/', views.edit_post, name='edit_post'),
     path('posts/<int:post_id>/delete/', views.delete_post, name='delete_post'),
+    path(
+        'posts/lookup/<str:field_name>/', views.lookup, name='lookup'
+    ),
+    path(
+        'thumbnails/<int:width>/<str:fmt>/<path:name>',
+        views.thumbnail,
+        name='thumbnail'
+    ),
 
     # Комментарии
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path(
         'posts/<int:post_id>/comment/',
         views.add_comment,
@@ -38,8 +53,8 @@ urlpatterns = [
     ),
 
     # Профиль
-    path('profile/<str:username>/', views.profile, name='profile'),
     path('profile/edit/', views.edit_profile, name='edit_profile'),
+    path('profile/<str:username>/', views.profile, name='profile'),
 
     # Авторизация
     path('auth/registration/', views.registration, name='registration'),
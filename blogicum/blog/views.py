@@ -1,93 +1,195 @@
+import logging
+
+from django.conf import settings
+from django.contrib import messages
 from django.contrib.auth import get_user_model, logout
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
-from django.db.models import Count
-from django.core.paginator import Paginator
+from django.db import DatabaseError, transaction
+from django.db.models import F
 from django.shortcuts import get_object_or_404, redirect, render
-from django.utils import timezone
-from django.http import Http404
-
-from .forms import CommentForm, PostForm, UserForm
-from .models import Category, Comment, Post
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, JsonResponse
+from django.utils.cache import patch_cache_control
+
+from .compression import stats as compression_stats
+from .forms import LOOKUP_FIELDS, CommentForm, PostForm, UserForm
+from .image_pipeline import enqueue_image
+from .models import Category, Comment, Post, new_version
+from .page_cache import cache_anonymous_page, conditional_page
+from .pagination import CachedCountPaginator, CursorPaginator
+from .query_budget import query_budget
+from .reference import get_reference
+from .search import SearchPaginator
+from .thumbnails import FORMATS, get_thumbnail, thumbnail_widths
+from .write_queue import WriteTimeout, save_comment
 
 User = get_user_model()
 
+logger = logging.getLogger(__name__)
+
 
-# === ТРИ ОТДЕЛЬНЫЕ ФУНКЦИИ СОГЛАСНО ТЗ ===
+# === ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ===
 
 def get_published_posts():
     """Фильтрация постов: только опубликованные, с опубликованной категорией и датой <= текущей."""
     return Post.objects.select_related(
         'category', 'location', 'author'
-    ).filter(
-        is_published=True,
-        pub_date__lte=timezone.now(),
-        category__is_published=True
-    )
-
+    ).published()
 
-def annotate_comment_count(post_queryset):
-    """Добавляет к каждому посту количество связанных комментариев."""
-    return post_queryset.annotate(comment_count=Count('comments'))
 
+def paginate_queryset(request, queryset, per_page=10,
+                      ordering=('-pub_date', '-id'), feed=None):
+    """Возвращает одну страницу пагинатора для заданного QuerySet.
 
-def paginate_queryset(request, queryset, per_page=10):
-    """Возвращает одну страницу пагинатора для заданного QuerySet."""
-    paginator = Paginator(queryset, per_page)
+    В режиме POSTS_PAGINATION_MODE = 'cursor' страницы выбираются
+    по ключу (pub_date, id) без OFFSET, иначе — по номеру страницы
+    с кешированным под именем ленты feed числом постов.
+    """
+    if getattr(settings, 'POSTS_PAGINATION_MODE', 'page') == 'cursor':
+        paginator = CursorPaginator(queryset, per_page, ordering)
+        return paginator.get_page(request.GET.get('cursor'))
+    paginator = CachedCountPaginator(queryset, per_page, feed=feed)
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
 
 
+def get_visible_post_or_404(request, post_id):
+    """Пост по id; черновики и будущие посты видны только автору."""
+    post = get_object_or_404(
+        Post.objects.select_related('category', 'location', 'author'),
+        pk=post_id
+    )
+    if not post.is_visible and request.user != post.author:
+        raise Http404
+    return post
+
+
+def paginate_comments(request, post):
+    """Страница комментариев поста по курсору (created_at, id)."""
+    paginator = CursorPaginator(
+        post.comments.select_related('author'),
+        getattr(settings, 'COMMENTS_PER_PAGE', 50),
+        ordering=('created_at', 'id')
+    )
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+# Для опубликованных постов visible_from совпадает с pub_date, поэтому
+# публичные ленты сортируются по нему и читаются прямо из индекса.
+FEED_ORDERING = ('-visible_from', '-id')
+
+
 # === VIEW-ФУНКЦИИ ===
 
+@query_budget(5)
+@conditional_page('index', max_age=60)
+@cache_anonymous_page('index')
 def index(request):
-    posts = get_published_posts().order_by('-pub_date')
-    posts = annotate_comment_count(posts)
-    page_obj = paginate_queryset(request, posts)
+    posts = get_published_posts().order_by(*FEED_ORDERING)
+    page_obj = paginate_queryset(
+        request, posts, ordering=FEED_ORDERING, feed='index'
+    )
     return render(request, 'blog/index.html', {'page_obj': page_obj})
 
 
-def post_detail(request, id):
-    post = get_object_or_404(
-        Post.objects.select_related('category', 'location', 'author'),
-        pk=id
-    )
-    # Проверка доступа: черновики и будущие посты видны только автору
-    if (
-        not post.is_published or
-        (post.category and not post.category.is_published) or
-        post.pub_date > timezone.now()
-    ):
-        if request.user != post.author:
-            raise Http404
-
+@query_budget(5)
+@conditional_page('post:{post_id}', max_age=300)
+@cache_anonymous_page('post:{post_id}')
+def post_detail(request, post_id):
+    post = get_visible_post_or_404(request, post_id)
     form = CommentForm()
-    comments = post.comments.all()
     context = {
         'post': post,
         'form': form,
-        'comments': comments,
+        'comments': paginate_comments(request, post),
     }
     return render(request, 'blog/detail.html', context)
 
 
+@query_budget(4)
+@cache_anonymous_page('post:{post_id}')
+def post_comments(request, post_id):
+    """HTML-фрагмент со следующей порцией комментариев поста."""
+    post = get_visible_post_or_404(request, post_id)
+    context = {
+        'post': post,
+        'comments': paginate_comments(request, post),
+    }
+    return render(request, 'includes/comment_list.html', context)
+
+
+@query_budget(2)
+def thumbnail(request, width, fmt, name):
+    """Вариант фото поста шириной не больше width в формате fmt."""
+    if (
+        width not in thumbnail_widths()
+        or fmt not in FORMATS
+        or not name.startswith(f"{Post.image.field.upload_to}/")
+    ):
+        raise Http404
+    try:
+        path = get_thumbnail(name, width, fmt)
+    except (OSError, SuspiciousFileOperation):
+        raise Http404
+    response = FileResponse(open(path, 'rb'), content_type=FORMATS[fmt][1])
+    # Имя загруженного файла не переиспользуется — вариант неизменен.
+    patch_cache_control(
+        response, public=True, max_age=60 * 60 * 24 * 365, immutable=True
+    )
+    return response
+
+
+@query_budget(2)
+@staff_member_required
+def compression(request):
+    """Счётчики сжатия ответов текущего процесса — для подбора уровня."""
+    return JsonResponse(compression_stats.snapshot())
+
+
+@query_budget(4)
+def search(request):
+    """Полнотекстовый поиск по видимым постам."""
+    query = request.GET.get('q', '').strip()
+    paginator = SearchPaginator(query, 10)
+    context = {
+        'query': query,
+        'page_obj': paginator.get_page(request.GET.get('cursor')),
+    }
+    return render(request, 'blog/search.html', context)
+
+
+@query_budget(7)
+@conditional_page('category:{category_slug}', max_age=60)
+@cache_anonymous_page('category:{category_slug}')
 def category_posts(request, category_slug):
-    category = get_object_or_404(Category, slug=category_slug, is_published=True)
-    posts = get_published_posts().filter(category=category).order_by('-pub_date')
-    posts = annotate_comment_count(posts)
-    page_obj = paginate_queryset(request, posts)
+    category = get_reference(
+        Category, 'slug', category_slug, is_published=True
+    )
+    if category is None:
+        raise Http404
+    posts = get_published_posts().filter(category=category).order_by(*FEED_ORDERING)
+    page_obj = paginate_queryset(
+        request, posts, ordering=FEED_ORDERING,
+        feed=f'category:{category.pk}'
+    )
     return render(request, 'blog/category.html', {'page_obj': page_obj, 'category': category})
 
 
+@query_budget(6)
+@cache_anonymous_page('author:{username}')
 def profile(request, username):
     user = get_object_or_404(User, username=username)
     # В профиле показываем ВСЕ посты автора (включая неопубликованные)
-    posts = Post.objects.filter(author=user).order_by('-pub_date')
-    posts = annotate_comment_count(posts)
-    page_obj = paginate_queryset(request, posts)
+    posts = Post.objects.select_related(
+        'category', 'location', 'author'
+    ).filter(author=user).order_by('-pub_date')
+    page_obj = paginate_queryset(request, posts, feed=f'author:{user.pk}')
     return render(request, 'blog/profile.html', {'profile': user, 'page_obj': page_obj})
 
 
+@query_budget(4)
 @login_required
 def edit_profile(request):
     user = request.user
@@ -101,6 +203,7 @@ def edit_profile(request):
     return render(request, 'blog/user.html', {'form': form})
 
 
+@query_budget(11)
 @login_required
 def create_post(request):
     if request.method == 'POST':
@@ -109,38 +212,64 @@ def create_post(request):
             post = form.save(commit=False)
             post.author = request.user
             post.save()
+            enqueue_image(post)
             return redirect('blog:profile', username=request.user.username)
     else:
         form = PostForm()
     return render(request, 'blog/create.html', {'form': form})
 
 
+@query_budget(3)
+@login_required
+def lookup(request, field_name):
+    """Подсказки для поля формы поста: строки, начинающиеся с ?q=."""
+    if field_name not in LOOKUP_FIELDS:
+        raise Http404
+    search_field = LOOKUP_FIELDS[field_name]
+    query = request.GET.get('q', '').strip()
+    results = []
+    if query:
+        queryset = PostForm.base_fields[field_name].queryset
+        results = [
+            {'id': pk, 'text': text}
+            for pk, text in queryset.filter(
+                **{f'{search_field}__istartswith': query}
+            ).order_by().values_list('pk', search_field)[:20]
+        ]
+    return JsonResponse({'results': results})
+
+
+@query_budget(14)
 @login_required
 def edit_post(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
-    if request.user != post.author:
-        return redirect('blog:post_detail', id=post_id)
+    if post.author_id != request.user.pk:
+        return redirect('blog:post_detail', post_id=post_id)
     if request.method == 'POST':
         form = PostForm(request.POST, request.FILES, instance=post)
         if form.is_valid():
             form.save()
-            return redirect('blog:post_detail', id=post_id)
+            if 'image' in form.changed_data:
+                enqueue_image(post)
+            return redirect('blog:post_detail', post_id=post_id)
     else:
         form = PostForm(instance=post)
     return render(request, 'blog/create.html', {'form': form})
 
 
+@query_budget(10)
 @login_required
 def delete_post(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
-    if request.user != post.author:
-        return redirect('blog:post_detail', id=post_id)
+    if post.author_id != request.user.pk:
+        return redirect('blog:post_detail', post_id=post_id)
     if request.method == 'POST':
         post.delete()
         return redirect('blog:profile', username=request.user.username)
     return render(request, 'blog/create.html', {'form': PostForm(instance=post)})
 
 
+@query_budget(8)
 @login_required
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
@@ -149,36 +278,53 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
-    return redirect('blog:post_detail', id=post_id)
-
-
+        try:
+            save_comment(comment)
+        except WriteTimeout as error:
+            messages.error(request, str(error))
+        except DatabaseError:
+            logger.exception('Не удалось сохранить комментарий')
+            messages.error(
+                request,
+                'Не удалось сохранить комментарий. '
+                'Попробуйте отправить его ещё раз.'
+            )
+    return redirect('blog:post_detail', post_id=post_id)
+
+
+@query_budget(4)
 @login_required
 def edit_comment(request, post_id, comment_id):
     comment = get_object_or_404(Comment, pk=comment_id, post_id=post_id)
-    if request.user != comment.author:
-        return redirect('blog:post_detail', id=post_id)
+    if comment.author_id != request.user.pk:
+        return redirect('blog:post_detail', post_id=post_id)
     if request.method == 'POST':
         form = CommentForm(request.POST, instance=comment)
         if form.is_valid():
             form.save()
-            return redirect('blog:post_detail', id=post_id)
+            return redirect('blog:post_detail', post_id=post_id)
     else:
         form = CommentForm(instance=comment)
     return render(request, 'blog/comment.html', {'form': form, 'comment': comment})
 
 
+@query_budget(8)
 @login_required
 def delete_comment(request, post_id, comment_id):
     comment = get_object_or_404(Comment, pk=comment_id, post_id=post_id)
-    if request.user != comment.author:
-        return redirect('blog:post_detail', id=post_id)
+    if comment.author_id != request.user.pk:
+        return redirect('blog:post_detail', post_id=post_id)
     if request.method == 'POST':
-        comment.delete()
-        return redirect('blog:post_detail', id=post_id)
+        with transaction.atomic():
+            comment.delete()
+            Post.objects.filter(pk=post_id, comment_count__gt=0).update(
+                comment_count=F('comment_count') - 1, version=new_version()
+            )
+        return redirect('blog:post_detail', post_id=post_id)
     return render(request, 'blog/comment.html', {'comment': comment})
 
 
+@query_budget(4)
 def registration(request):
     if request.method == 'POST':
         form = UserCreationForm(request.POST)
@@ -190,6 +336,7 @@ def registration(request):
     return render(request, 'registration/registration_form.html', {'form': form})
 
 
+@query_budget(4)
 @login_required
 def logout_view(request):
     logout(request)
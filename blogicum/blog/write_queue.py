@@ -0,0 +1,191 @@
+import logging
+import queue
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+
+from .models import Comment, Post, new_version
+from .page_cache import invalidate_tags
+from .signals import stored_post_page_tags
+
+logger = logging.getLogger(__name__)
+
+_queue = None
+_writer = None
+_writer_lock = threading.Lock()
+
+
+class WriteTimeout(Exception):
+    """Писатель не подтвердил запись за COMMENT_WRITE_TIMEOUT секунд."""
+
+
+def setting(name, default):
+    return getattr(settings, f'COMMENT_WRITE_{name}', default)
+
+
+class PendingWrite:
+    """Комментарий в очереди и подтверждение его записи.
+
+    Запись, отменённую по таймауту до того, как её взял писатель,
+    писатель пропускает: запрос уже ответил пользователю ошибкой,
+    и повторная отправка не создаст дубликат.
+    """
+
+    def __init__(self, comment):
+        self.comment = comment
+        self.error = None
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+        self._taken = False
+        self._cancelled = False
+
+    def take(self):
+        """Отмечает запись взятой писателем; False — она отменена."""
+        with self._lock:
+            if not self._cancelled:
+                self._taken = True
+            return self._taken
+
+    def cancel(self):
+        """Отменяет запись; False — писатель уже взял её в пачку."""
+        with self._lock:
+            if not self._taken:
+                self._cancelled = True
+            return self._cancelled
+
+    def resolve(self, error=None):
+        self.error = error
+        self.done.set()
+
+
+def save_comment(comment):
+    """Сохраняет новый комментарий и увеличивает счётчик у поста.
+
+    При COMMENT_WRITE_BATCHING запись уходит единственному потоку-
+    писателю, который сохраняет накопившиеся комментарии одной
+    транзакцией; функция возвращается, только когда транзакция с этим
+    комментарием зафиксирована, и поднимает её ошибку, если она была.
+
+    WriteTimeout означает, что комментарий не записан, — кроме случая,
+    когда писатель взял его в пачку и не успел её записать за второй
+    такой же срок: тогда комментарий может появиться позже, о чём
+    говорит текст исключения.
+    """
+    if not setting('BATCHING', False):
+        with transaction.atomic():
+            comment.save()
+            Post.objects.filter(pk=comment.post_id).update(
+                comment_count=F('comment_count') + 1, version=new_version()
+            )
+        return comment
+    pending = PendingWrite(comment)
+    timeout = setting('TIMEOUT', 10)
+    try:
+        writer_queue().put(pending, timeout=timeout)
+    except queue.Full:
+        raise WriteTimeout(
+            'Сервер перегружен, комментарий не сохранён. '
+            'Попробуйте отправить его ещё раз.'
+        )
+    if not pending.done.wait(timeout):
+        if pending.cancel():
+            raise WriteTimeout(
+                'Сервер перегружен, комментарий не сохранён. '
+                'Попробуйте отправить его ещё раз.'
+            )
+        # Пачка с комментарием уже пишется — даём ей закончить.
+        if not pending.done.wait(timeout):
+            raise WriteTimeout(
+                'Комментарий сохраняется дольше обычного и появится '
+                'позже. Не отправляйте его повторно.'
+            )
+    if pending.error is not None:
+        raise pending.error
+    return comment
+
+
+def writer_queue():
+    """Очередь писателя; сам поток запускается при первом обращении."""
+    global _queue, _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            if _queue is None:
+                _queue = queue.Queue(maxsize=setting('MAX_PENDING', 1000))
+            _writer = threading.Thread(
+                target=run_writer, args=(_queue,),
+                name='comment-writer', daemon=True,
+            )
+            _writer.start()
+    return _queue
+
+
+def take_batch(pending_queue, first):
+    """Первая запись и всё, что уже ждёт в очереди, — до размера пачки.
+
+    Пачка не ждёт новых записей: пока пишется одна, в очереди копится
+    следующая, и чем больше параллельных запросов, тем крупнее пачки.
+    """
+    batch = [first]
+    limit = setting('BATCH_SIZE', 100)
+    while len(batch) < limit:
+        try:
+            batch.append(pending_queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+def run_writer(pending_queue):
+    while True:
+        batch = take_batch(pending_queue, pending_queue.get())
+        try:
+            write_batch(batch)
+        except Exception:
+            logger.exception('Не удалось записать пачку комментариев')
+        finally:
+            close_old_connections()
+
+
+def write_batch(batch):
+    """Записывает пачку одной транзакцией и подтверждает каждую запись.
+
+    Если пачка не записалась целиком (например, пост удалён), записи
+    повторяются по одной, чтобы ошибка досталась только своему запросу.
+    Отменённые по таймауту записи пропускаются.
+    """
+    batch = [pending for pending in batch if pending.take()]
+    if not batch:
+        return
+    try:
+        with transaction.atomic():
+            _insert([pending.comment for pending in batch])
+    except Exception as error:
+        if len(batch) == 1:
+            batch[0].resolve(error)
+            return
+        for pending in batch:
+            # bulk_create мог успеть проставить pk до отката транзакции.
+            pending.comment.pk = None
+            pending.comment._state.adding = True
+            write_batch([pending])
+        return
+    try:
+        for post_id in {pending.comment.post_id for pending in batch}:
+            # bulk_create не шлёт post_save — страницы поста сбрасываются
+            # так же, как в reset_comment_caches.
+            invalidate_tags(*stored_post_page_tags(post_id))
+    finally:
+        for pending in batch:
+            pending.resolve()
+
+
+def _insert(comments):
+    Comment.objects.bulk_create(comments)
+    counts = Counter(comment.post_id for comment in comments)
+    for post_id, count in counts.items():
+        Post.objects.filter(pk=post_id).update(
+            comment_count=F('comment_count') + count, version=new_version()
+        )
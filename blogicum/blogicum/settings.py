@@ -37,13 +37,16 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.forms',
     'django_bootstrap5',
     'blog.apps.BlogConfig',
     'pages.apps.PagesConfig',
 ]
 
 MIDDLEWARE = [
+    'blog.query_budget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'blog.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -52,6 +55,16 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Сжатие ответов (blog.compression): ответы меньше MIN_SIZE байт
+# не сжимаются — заголовки gzip/brotli съели бы выигрыш
+COMPRESSION_MIN_SIZE = 512
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+
+# Превышение бюджета SQL-запросов view: исключение при разработке,
+# предупреждение в лог в продакшене
+QUERY_BUDGET_RAISE = DEBUG
+
 ROOT_URLCONF = 'blogicum.urls'
 
 TEMPLATES_DIR = BASE_DIR / 'templates'
@@ -78,13 +91,34 @@ WSGI_APPLICATION = 'blogicum.wsgi.application'
 # База данных
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# Соединения живут между запросами (CONN_MAX_AGE) и проверяются перед
+# повторным использованием. Транзакции сразу берут блокировку записи
+# (IMMEDIATE): иначе транзакция, начавшая с чтения, не дождётся записи
+# и упадёт с «database is locked», не дожидаясь busy_timeout
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# Пакетная запись комментариев (blog.write_queue): при BATCHING новые
+# комментарии сохраняет один поток-писатель пачками до BATCH_SIZE штук
+# в одной транзакции; запрос ждёт фиксации своей пачки не дольше TIMEOUT
+# секунд
+COMMENT_WRITE_BATCHING = False
+COMMENT_WRITE_BATCH_SIZE = 100
+COMMENT_WRITE_MAX_PENDING = 1000
+COMMENT_WRITE_TIMEOUT = 10
+
+# PRAGMA для каждого нового соединения с SQLite — DEFAULT_PRAGMAS
+# из blog.sqlite; заменить их целиком можно словарём SQLITE_PRAGMAS
+
 
 # Валидация паролей
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -128,13 +162,119 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static_dev'
 ]
 
+# Таблица стилей Bootstrap, прореженная под классы шаблонов командой
+# prune_css, и критический CSS, встраиваемый в base.html, — правила
+# для шаблонов CSS_PRUNE_CRITICAL_TEMPLATES
+CSS_PRUNE_SOURCE = BASE_DIR / 'static_dev/css/bootstrap.min.css'
+CSS_PRUNE_OUTPUT = BASE_DIR / 'static_dev/css/bootstrap.pruned.css'
+CSS_PRUNE_CRITICAL_OUTPUT = BASE_DIR / 'templates/includes/critical_css.html'
+CSS_PRUNE_CRITICAL_TEMPLATES = ('base.html', 'includes/header.html')
+
+# Сюда collectstatic собирает статику с хешами в именах и сжатыми
+# копиями; без DEBUG её отдаёт blog.staticfiles.serve
+STATIC_ROOT = BASE_DIR / 'static'
+
 MEDIA_ROOT = BASE_DIR / 'media'
 MEDIA_URL = '/media/'
 
+# Фото постов хранятся под хешем содержимого: одинаковые загрузки
+# занимают диск один раз. Файлы без ссылок удаляет sweep_images;
+# освобождённое постом фото удаляется сразу, только если файл не
+# трогали дольше MEDIA_RELEASE_MIN_AGE секунд — иначе его может ждать
+# ещё не сохранённый пост с такой же загрузкой
+MEDIA_RELEASE_MIN_AGE = 10 * 60
+STORAGES = {
+    'default': {
+        'BACKEND': 'blog.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'blog.staticfiles.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Загрузки пишутся сразу во временный файл, а не копятся в памяти;
+# фото постов проверяется по заголовку до декодирования: не больше
+# IMAGE_UPLOAD_MAX_BYTES байт, IMAGE_UPLOAD_MAX_SIDE пикселей по стороне
+# и IMAGE_UPLOAD_MAX_PIXELS пикселей всего. Последний лимит действует
+# и для Pillow в целом, так что декодирование одного фото занимает
+# в памяти не больше ~4 байт на пиксель от него
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+IMAGE_UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+IMAGE_UPLOAD_MAX_SIDE = 8000
+IMAGE_UPLOAD_MAX_PIXELS = 25_000_000
+
+# Варианты фото постов: допустимые ширины, каталог дискового кеша
+# и предельный размер кеша, сверх которого удаляются давно не
+# запрошенные варианты. Размер проверяется раз на THUMBNAIL_TRIM_EVERY
+# созданных вариантов и командой trim_thumbnails (по расписанию)
+THUMBNAIL_WIDTHS = (320, 640, 1280)
+THUMBNAIL_ROOT = MEDIA_ROOT / 'thumbnails'
+THUMBNAIL_CACHE_MAX_BYTES = 512 * 1024 * 1024
+THUMBNAIL_TRIM_EVERY = 200
+
+# Фоновая обработка загруженных фото (blog.image_pipeline): поворот по
+# EXIF, удаление метаданных, пережатие и заготовка вариантов. Очередь
+# хранится в таблице ImageTask и разбирается командой process_images;
+# при AUTOSTART её разбирает ещё и пул потоков веб-процесса
+IMAGE_PIPELINE_AUTOSTART = False
+IMAGE_PIPELINE_WORKERS = 2
+IMAGE_PIPELINE_MAX_ATTEMPTS = 5
+IMAGE_PIPELINE_RETRY_DELAY = 30
+IMAGE_PIPELINE_MAX_SIDE = 2560
+IMAGE_PIPELINE_QUALITY = 85
+
+# Шаблоны виджетов форм ищутся там же, где и остальные шаблоны проекта
+FORM_RENDERER = 'django.forms.renderers.TemplatesSetting'
+
 # Бэкенд для email
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = BASE_DIR / 'sent_emails'
 
+# Кеш, общий для всех процессов сервера: в нём версии меток страниц
+# и справочников (blog.page_cache, blog.reference), закешированные
+# страницы и счётчики лент. Кеш в памяти (LocMemCache) у каждого
+# процесса свой — запись в одном не сбрасывала бы страницы в других.
+# Для нескольких серверов нужен сетевой бэкенд, например Redis
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    }
+}
+
+# Пагинация лент: 'page' — по номеру страницы (LIMIT/OFFSET),
+# 'cursor' — keyset по (pub_date, id) с токенами ?cursor=
+POSTS_PAGINATION_MODE = 'cursor'
+
+# Число постов ленты для режима 'page' кешируется на столько секунд
+# и считается не дальше POSTS_COUNT_LIMIT строк; сверх лимита
+# пагинатор проверяет только наличие следующей страницы.
+POSTS_COUNT_CACHE_TIMEOUT = 60 * 60
+POSTS_COUNT_LIMIT = 10000
+
+# Комментариев на странице поста и в каждой догружаемой порции
+COMMENTS_PER_PAGE = 50
+
+# Время жизни закешированных страниц для анонимных посетителей, секунды;
+# при изменении данных и наступлении отложенных публикаций страницы
+# сбрасываются раньше
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Если в справочнике (категории, местоположения) больше строк, форма
+# поста показывает вместо списка поле с подсказками; размер справочника
+# перепроверяется не чаще раза в LOOKUP_SIZE_CACHE_TIMEOUT секунд
+POST_FORM_LOOKUP_THRESHOLD = 100
+LOOKUP_SIZE_CACHE_TIMEOUT = 60 * 10
+
+# Справочники не больше стольких строк держатся в памяти каждого
+# процесса и сверяются с версией в общем кеше (CACHES)
+REFERENCE_CACHE_MAX_ROWS = 1000
+
 # URL для входа
 LOGIN_URL = '/auth/login/'
 
@@ -14,10 +14,12 @@
     2. Добавьте URL в urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from blog.staticfiles import serve as serve_static
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('blog.urls')),
@@ -29,6 +31,14 @@ if settings.DEBUG:
     urlpatterns += static(
         settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
     )
+else:
+    # В DEBUG статику из STATICFILES_DIRS отдаёт runserver.
+    urlpatterns += [
+        re_path(
+            r'^%s(?P<path>.*)$' % settings.STATIC_URL.lstrip('/'),
+            serve_static,
+        ),
+    ]
 
 handler403 = 'pages.views.csrf_failure'
 handler404 = 'pages.views.page_not_found'
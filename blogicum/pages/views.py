@@ -1,11 +1,15 @@
 from django.shortcuts import render
 from django.views.generic import TemplateView
 
+from blog.query_budget import query_budget
 
+
+@query_budget(2)
 class AboutView(TemplateView):
     template_name = 'pages/about.html'
 
 
+@query_budget(2)
 class RulesView(TemplateView):
     template_name = 'pages/rules.html'
 
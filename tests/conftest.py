@@ -19,6 +19,7 @@ from typing import (
 import pytest
 from django.apps import apps
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.db.models import Model, Field
 from django.forms import BaseForm
 from django.http import HttpResponse
@@ -41,6 +42,21 @@ def enable_debug_false():
         yield
 
 
+@pytest.fixture(autouse=True)
+def isolated_cache():
+    # Файловый кеш из настроек пережил бы тестовую базу и другие тесты.
+    # Хранилище LocMemCache общее для всех экземпляров с одним
+    # LOCATION, поэтому его ещё и очищаем.
+    with override_settings(CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }):
+        cache.clear()
+        yield
+        cache.clear()
+
+
 class SafeImportFromContextManager:
     def __init__(
             self,
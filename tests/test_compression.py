@@ -0,0 +1,203 @@
+import asyncio
+import gzip
+import os
+import zlib
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import Client, RequestFactory
+from django.utils import timezone
+
+from blog import compression
+from blog.compression import CompressionMiddleware, stats
+
+BODY = "<p>Сжимаемая страница блога.</p>\n" * 100
+
+
+class FakeBrotliCompressor:
+    """Заменяет brotli.Compressor: brotli здесь может быть не установлен."""
+
+    def __init__(self, mode, quality):
+        self._compressor = zlib.compressobj(wbits=-15)
+
+    def process(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+def fake_decompress(data):
+    return zlib.decompress(data, wbits=-15)
+
+
+@pytest.fixture(autouse=True)
+def reset_stats():
+    stats.reset()
+    yield
+    stats.reset()
+
+
+@pytest.fixture
+def fake_brotli(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", SimpleNamespace(
+        Compressor=FakeBrotliCompressor, MODE_TEXT=None,
+    ))
+
+
+@pytest.fixture
+def no_brotli(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+
+
+def process(response, accept_encoding="gzip, deflate, br"):
+    request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING=accept_encoding)
+    return CompressionMiddleware(lambda request: response)(request)
+
+
+def decompress(response):
+    if response.streaming:
+        data = b"".join(response.streaming_content)
+    else:
+        data = response.content
+    return {
+        "gzip": gzip.decompress,
+        "br": fake_decompress,
+    }[response["Content-Encoding"]](data)
+
+
+@pytest.mark.parametrize("accept_encoding, encoding", (
+    ("gzip, deflate, br", "br"),
+    ("br;q=0, gzip", "gzip"),
+    ("gzip", "gzip"),
+))
+def test_encoding_is_negotiated(fake_brotli, accept_encoding, encoding):
+    response = process(HttpResponse(BODY), accept_encoding)
+    assert response["Content-Encoding"] == encoding, (
+        "Убедитесь, что ответ сжимается brotli, если клиент его"
+        " принимает, и gzip в остальных случаях."
+    )
+    assert decompress(response) == BODY.encode()
+    assert response["Content-Length"] == str(len(response.content))
+    assert response["Vary"] == "Accept-Encoding"
+    assert f'desc="{encoding}"' in response["Server-Timing"]
+    assert stats.snapshot()["encodings"][encoding]["responses"] == 1
+
+
+@pytest.mark.parametrize("accept_encoding, encoding", (
+    ("gzip, br", "gzip"),
+    ("br", None),
+))
+def test_gzip_fallback_without_brotli(no_brotli, accept_encoding, encoding):
+    response = process(HttpResponse(BODY), accept_encoding)
+    assert response.get("Content-Encoding") == encoding, (
+        "Убедитесь, что без модуля brotli ответы сжимаются gzip."
+    )
+    assert response["Vary"] == "Accept-Encoding"
+
+
+@pytest.mark.parametrize("response, reason", (
+    (HttpResponse("<p>Коротко</p>"), "small"),
+    (HttpResponse(BODY, content_type="image/png"), "content_type"),
+    (HttpResponse(BODY, status=206), "partial"),
+    (HttpResponse(os.urandom(4096), content_type="text/plain"),
+     "incompressible"),
+    (StreamingHttpResponse(iter([b"x"]), headers={"Content-Length": "1"}),
+     "small"),
+), ids=("small", "content_type", "partial", "incompressible", "stream"))
+def test_uncompressed_responses(response, reason):
+    content = b"" if response.streaming else response.content
+    response = process(response)
+    assert not response.has_header("Content-Encoding"), (
+        "Убедитесь, что малые, частичные, несжимаемые ответы и ответы"
+        " несжимаемых типов отдаются как есть."
+    )
+    if not response.streaming:
+        assert response.content == content
+    assert stats.snapshot()["skipped"] == {reason: 1}
+
+
+def test_encoded_response_is_left_alone():
+    response = HttpResponse(gzip.compress(BODY.encode()))
+    response["Content-Encoding"] = "gzip"
+    content = response.content
+    response = process(response, "gzip")
+    assert response.content == content
+    assert not response.has_header("Vary")
+    assert stats.snapshot()["skipped"] == {}
+
+
+def test_not_accepted_encoding():
+    response = process(HttpResponse(BODY), "identity")
+    assert not response.has_header("Content-Encoding")
+    assert response["Vary"] == "Accept-Encoding", (
+        "Убедитесь, что несжатый ответ тоже зависит от Accept-Encoding."
+    )
+    assert stats.snapshot()["skipped"] == {"not_accepted": 1}
+
+
+def test_streaming_response_is_compressed_by_chunks():
+    chunks = [line.encode() for line in BODY.splitlines(keepends=True)]
+    response = StreamingHttpResponse(
+        iter(chunks), headers={"Content-Length": str(len(BODY.encode()))}
+    )
+    response = process(response, "gzip")
+    assert response["Content-Encoding"] == "gzip"
+    assert not response.has_header("Content-Length"), (
+        "Убедитесь, что у сжатого потока нет исходной Content-Length."
+    )
+    parts = list(response.streaming_content)
+    assert len(parts) > 1, "Убедитесь, что поток сжимается по частям."
+    assert gzip.decompress(b"".join(parts)) == BODY.encode()
+
+
+def test_async_streaming_response_is_compressed():
+    async def chunks():
+        for line in BODY.splitlines(keepends=True):
+            yield line
+
+    async def read(response):
+        return b"".join([part async for part in response.streaming_content])
+
+    response = process(StreamingHttpResponse(chunks()), "gzip")
+    assert response["Content-Encoding"] == "gzip"
+    assert gzip.decompress(asyncio.run(read(response))) == BODY.encode()
+
+
+def test_strong_etag_becomes_weak():
+    response = HttpResponse(BODY, headers={"ETag": '"abc"'})
+    assert process(response, "gzip")["ETag"] == 'W/"abc"'
+    response = HttpResponse(BODY, headers={"ETag": 'W/"abc"'})
+    assert process(response, "gzip")["ETag"] == 'W/"abc"'
+
+
+@pytest.mark.django_db
+def test_compressed_page_answers_304(mixer, user):
+    post = mixer.blend(
+        "blog.Post", author=user,
+        category=mixer.blend("blog.Category", is_published=True),
+        is_published=True, pub_date=timezone.now() - timedelta(days=1),
+    )
+    client = Client(HTTP_ACCEPT_ENCODING="gzip")
+    url = f"/posts/{post.pk}/"
+    response = client.get(url)
+    assert response["Content-Encoding"] == "gzip"
+    assert response["ETag"].startswith('W/"'), (
+        "Убедитесь, что сжатая страница получает слабый ETag."
+    )
+    response = client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+    assert response.status_code == 304, (
+        "Убедитесь, что слабый ETag сжатой страницы даёт 304 Not Modified."
+    )
+
+
+def test_real_brotli_round_trip():
+    brotli = pytest.importorskip("brotli")
+    response = process(HttpResponse(BODY), "br")
+    assert response["Content-Encoding"] == "br"
+    assert brotli.decompress(response.content) == BODY.encode()
@@ -0,0 +1,10 @@
+from blog.checks import check_pruned_css
+
+
+def test_pruned_css_covers_templates():
+    errors = check_pruned_css(None)
+    assert not errors, (
+        "Шаблоны используют классы, вырезанные из прореженной таблицы "
+        "стилей, — запустите `manage.py prune_css`: "
+        + "; ".join(error.msg for error in errors)
+    )
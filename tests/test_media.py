@@ -0,0 +1,153 @@
+import io
+import re
+import struct
+import zlib
+from datetime import timedelta
+
+import pytest
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from PIL import Image
+
+from blog.forms import BoundedImageField
+from blog.image_pipeline import process_task
+from blog.media import release_images
+from blog.models import ImageTask
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    settings.THUMBNAIL_ROOT = tmp_path / "thumbnails"
+    settings.THUMBNAIL_WIDTHS = (32,)
+    return tmp_path
+
+
+def jpeg_bytes(color="red"):
+    output = io.BytesIO()
+    Image.new("RGB", (64, 48), color).save(output, "JPEG")
+    return output.getvalue()
+
+
+@pytest.mark.django_db
+def test_recent_file_is_not_released(settings):
+    name = default_storage.save("posts/photo.jpg", ContentFile(jpeg_bytes()))
+    assert release_images(name) == set()
+    assert default_storage.exists(name), (
+        "Убедитесь, что release_images не удаляет только что загруженный"
+        " файл: его может ждать ещё не сохранённый пост."
+    )
+    settings.MEDIA_RELEASE_MIN_AGE = 0
+    assert release_images(name) == {name}
+    assert not default_storage.exists(name)
+
+
+@pytest.mark.django_db
+def test_processed_image_is_saved_in_upload_dir(mixer, user, settings):
+    settings.MEDIA_RELEASE_MIN_AGE = 0
+    original = default_storage.save(
+        "posts/photo.jpeg", ContentFile(jpeg_bytes())
+    )
+    post = mixer.blend(
+        "blog.Post", author=user, image=original,
+        pub_date=timezone.now() - timedelta(days=1),
+    )
+    task = ImageTask.objects.create(post=post, image_name=original)
+    process_task(task)
+    post.refresh_from_db()
+    assert re.fullmatch(r"posts/[0-9a-f]{2}/[0-9a-f]{64}\.jpeg",
+                        post.image.name), post.image.name
+    assert default_storage.exists(post.image.name)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("upload_name, image_format, extension", (
+    ("posts/photo.jpeg", "JPEG", ".jpeg"),
+    ("posts/photo.JPG", "JPEG", ".jpg"),
+    ("posts/photo.jpeg", "PNG", ".png"),
+    ("posts/photo.png", "WEBP", ".webp"),
+))
+def test_processed_image_extension_matches_format(
+    mixer, user, upload_name, image_format, extension
+):
+    output = io.BytesIO()
+    Image.new("RGB", (64, 48), "blue").save(output, image_format)
+    original = default_storage.save(
+        upload_name, ContentFile(output.getvalue())
+    )
+    post = mixer.blend(
+        "blog.Post", author=user, image=original,
+        pub_date=timezone.now() - timedelta(days=1),
+    )
+    process_task(ImageTask.objects.create(post=post, image_name=original))
+    post.refresh_from_db()
+    assert post.image.name.endswith(extension), (
+        "Убедитесь, что расширение обработанного фото соответствует его"
+        f" формату: {image_format} сохранён как {post.image.name}."
+    )
+
+
+def png_header(width, height):
+    """PNG, у которого в заголовке указан размер, а пикселей почти нет.
+
+    Такой файл весит десятки байт, но Pillow по заголовку считает его
+    картинкой width×height — как «бомбу» при распаковке.
+    """
+    def chunk(kind, data):
+        return (
+            struct.pack(">I", len(data)) + kind + data
+            + struct.pack(">I", zlib.crc32(kind + data))
+        )
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(b"\x00"))
+        + chunk(b"IEND", b"")
+    )
+
+
+def clean_upload(data, name="photo.png"):
+    return BoundedImageField().clean(SimpleUploadedFile(name, data))
+
+
+def rejection_code(data, name="photo.png"):
+    with pytest.raises(ValidationError) as error:
+        clean_upload(data, name)
+    return error.value.code
+
+
+def test_upload_within_limits_is_accepted():
+    assert clean_upload(jpeg_bytes(), "photo.jpg").image.size == (64, 48)
+
+
+def test_upload_over_byte_limit_is_rejected(settings):
+    settings.IMAGE_UPLOAD_MAX_BYTES = 100
+    assert rejection_code(jpeg_bytes(), "photo.jpg") == "too_large", (
+        "Убедитесь, что файл больше IMAGE_UPLOAD_MAX_BYTES отклоняется."
+    )
+
+
+@pytest.mark.parametrize("limits", (
+    {"IMAGE_UPLOAD_MAX_SIDE": 50},
+    {"IMAGE_UPLOAD_MAX_PIXELS": 1000},
+), ids=("side", "pixels"))
+def test_upload_over_pixel_limits_is_rejected(settings, limits):
+    for name, value in limits.items():
+        setattr(settings, name, value)
+    assert rejection_code(jpeg_bytes(), "photo.jpg") == "too_many_pixels", (
+        "Убедитесь, что фото больше IMAGE_UPLOAD_MAX_SIDE по стороне или"
+        " IMAGE_UPLOAD_MAX_PIXELS пикселей всего отклоняется."
+    )
+
+
+@pytest.mark.parametrize("size", (20000, 6000), ids=("error", "warning"))
+def test_decompression_bomb_is_rejected(size):
+    data = png_header(size, size)
+    assert len(data) < 100
+    assert rejection_code(data) == "decompression_bomb", (
+        "Убедитесь, что маленький файл с огромным размером в заголовке"
+        " отклоняется до распаковки."
+    )
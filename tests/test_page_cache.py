@@ -0,0 +1,158 @@
+from datetime import timedelta
+
+import pytest
+from django.core.cache import cache
+from django.test import Client
+from django.utils.cache import get_max_age
+from django.utils import timezone
+
+from blog.models import Comment, Post
+from blog.page_cache import REFERENCE_TAG, get_tag_versions
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def post(mixer, user, another_user):
+    category = mixer.blend("blog.Category", is_published=True)
+    post = mixer.blend(
+        "blog.Post",
+        author=user,
+        category=category,
+        is_published=True,
+        pub_date=timezone.now() - timedelta(days=1),
+    )
+    mixer.cycle(3).blend("blog.Comment", post=post, author=another_user)
+    return post
+
+
+@pytest.mark.django_db
+def test_login_and_password_change_keep_pages(post, user):
+    tags = [REFERENCE_TAG, "index", f"post:{post.pk}", f"author:{user.username}"]
+    versions = get_tag_versions(tags)
+    Client().force_login(user)
+    user.set_password("new-password-123")
+    user.save()
+    assert get_tag_versions(tags) == versions, (
+        "Убедитесь, что вход и смена пароля пользователя не сбрасывают"
+        " закешированные страницы."
+    )
+
+
+@pytest.mark.django_db
+def test_username_change_resets_author_pages(post, user, another_user):
+    client = Client()
+    assert f"@{user.username}" in client.get("/").content.decode()
+    other_tags = [REFERENCE_TAG, f"author:{another_user.username}"]
+    other_versions = get_tag_versions(other_tags)
+    old_username = user.username
+    user.username = "renamed_author"
+    user.save()
+    content = client.get("/").content.decode()
+    assert "@renamed_author" in content and f"@{old_username}" not in content, (
+        "Убедитесь, что после смены имени пользователя карточки его постов"
+        " в ленте показывают новое имя."
+    )
+    assert get_tag_versions(other_tags) == other_versions, (
+        "Убедитесь, что смена имени пользователя не сбрасывает страницы,"
+        " не связанные с ним."
+    )
+
+
+@pytest.mark.django_db
+def test_post_delete_removes_comments(post, mixer, user):
+    post.delete()
+    assert not Comment.objects.exists()
+    other = mixer.blend("blog.Post", author=user)
+    mixer.cycle(2).blend("blog.Comment", post=other, author=user)
+    Post.objects.filter(pk=other.pk).delete()
+    assert not Comment.objects.exists()
+
+
+@pytest.mark.django_db
+def test_partial_save_bumps_version(post):
+    version = Post.objects.get(pk=post.pk).version
+    post.title = "Новый заголовок"
+    post.save(update_fields=["title"])
+    stored = Post.objects.get(pk=post.pk)
+    assert stored.title == "Новый заголовок"
+    assert stored.version != version, (
+        "Убедитесь, что `Post.save(update_fields=...)` сохраняет новую"
+        " версию поста: по ней строится ключ кеша карточки."
+    )
+    assert "Новый заголовок" in Client().get("/").content.decode()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("validator", ("ETag", "Last-Modified"))
+def test_unchanged_page_answers_304(post, validator):
+    client = Client()
+    url = f"/posts/{post.pk}/"
+    response = client.get(url)
+    assert response.status_code == 200
+    header = {
+        "ETag": "HTTP_IF_NONE_MATCH",
+        "Last-Modified": "HTTP_IF_MODIFIED_SINCE",
+    }[validator]
+    response = client.get(url, **{header: response[validator]})
+    assert response.status_code == 304, (
+        f"Убедитесь, что неизменившаяся страница по {validator} отвечает"
+        " 304 Not Modified."
+    )
+
+
+@pytest.mark.django_db
+def test_comment_and_edit_change_etag(post, mixer, user):
+    client = Client()
+    url = f"/posts/{post.pk}/"
+    etag = client.get(url)["ETag"]
+    mixer.blend("blog.Comment", post=post, author=user)
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200, (
+        "Убедитесь, что новый комментарий меняет ETag страницы поста."
+    )
+    etag = response["ETag"]
+    post.title = "Исправленный заголовок"
+    post.save()
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200, (
+        "Убедитесь, что правка поста меняет ETag страницы поста."
+    )
+    assert "Исправленный заголовок" in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_logged_in_users_get_own_etags(post, user, another_user):
+    author, reader = Client(), Client()
+    author.force_login(user)
+    reader.force_login(another_user)
+    url = f"/posts/{post.pk}/"
+    response = author.get(url)
+    assert "private" in response["Cache-Control"]
+    assert reader.get(url)["ETag"] != response["ETag"]
+    assert reader.get(
+        url, HTTP_IF_NONE_MATCH=response["ETag"]
+    ).status_code == 200, (
+        "Убедитесь, что ETag страницы для одного пользователя не даёт"
+        " 304 другому: страницы отличаются шапкой и правами."
+    )
+
+
+@pytest.mark.django_db
+def test_public_max_age_ends_at_next_publication(post, user):
+    Post.objects.create(
+        title="Отложенный", text="Текст", author=user,
+        category=post.category, is_published=True,
+        pub_date=timezone.now() + timedelta(seconds=20),
+    )
+    response = Client().get("/")
+    assert "public" in response["Cache-Control"]
+    assert 0 < get_max_age(response) <= 20, (
+        "Убедитесь, что общий кеш не хранит ленту дольше момента"
+        " следующей отложенной публикации."
+    )
@@ -0,0 +1,108 @@
+from datetime import timedelta
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from blog.models import Post
+from blog.pagination import CachedCountPaginator, feed_count_key
+
+N_POSTS = 25
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def posts(mixer, user):
+    category = mixer.blend("blog.Category", is_published=True)
+    now = timezone.now()
+    return mixer.cycle(N_POSTS).blend(
+        "blog.Post",
+        author=user,
+        category=category,
+        is_published=True,
+        pub_date=(now - timedelta(hours=i) for i in range(1, N_POSTS + 1)),
+    )
+
+
+def feed_queryset():
+    return Post.objects.published().order_by("-pub_date", "-id")
+
+
+@pytest.mark.django_db
+def test_cached_count_is_reused_and_reset_on_post_write(posts, mixer, user):
+    assert CachedCountPaginator(feed_queryset(), 10, feed="index").count == (
+        N_POSTS
+    )
+    assert cache.get(feed_count_key("index")) == (N_POSTS, True)
+    with CaptureQueriesContext(connection) as ctx:
+        count = CachedCountPaginator(feed_queryset(), 10, feed="index").count
+    assert count == N_POSTS
+    assert not any("COUNT" in query["sql"] for query in ctx.captured_queries), (
+        "Убедитесь, что число постов ленты берётся из кеша, а не считается"
+        " заново на каждый запрос."
+    )
+    mixer.blend(
+        "blog.Post",
+        author=user,
+        category=posts[0].category,
+        is_published=True,
+        pub_date=timezone.now() - timedelta(minutes=1),
+    )
+    assert cache.get(feed_count_key("index")) is None, (
+        "Убедитесь, что сохранение поста сбрасывает закешированное число"
+        " постов ленты."
+    )
+    paginator = CachedCountPaginator(feed_queryset(), 10, feed="index")
+    assert paginator.count == N_POSTS + 1
+
+
+@pytest.mark.django_db
+def test_count_limit_gives_lower_estimate(posts):
+    paginator = CachedCountPaginator(feed_queryset(), 10, count_limit=12)
+    assert paginator.count == 13
+    assert not paginator.count_is_exact
+    exact = CachedCountPaginator(feed_queryset(), 10, count_limit=100)
+    assert exact.count == N_POSTS
+    assert exact.count_is_exact
+
+
+@pytest.mark.django_db
+def test_has_next_without_exact_count(posts):
+    paginator = CachedCountPaginator(feed_queryset(), 10, count_limit=5)
+    second = paginator.get_page(2)
+    assert list(second) == posts[10:20]
+    assert second.has_next()
+    third = paginator.get_page(3)
+    assert list(third) == posts[20:]
+    assert not third.has_next()
+    assert list(third.page_range) == [1, 2, 3]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("count_limit", (None, 5), ids=("exact", "estimate"))
+def test_out_of_range_page_falls_back(posts, count_limit):
+    paginator = CachedCountPaginator(
+        feed_queryset(), 10, count_limit=count_limit
+    )
+    page = paginator.get_page(999)
+    assert page.object_list, (
+        "Убедитесь, что номер страницы за концом ленты не приводит к"
+        " пустой странице или ошибке."
+    )
+    assert list(paginator.get_page("abc")) == posts[:10]
+
+
+@pytest.mark.django_db
+def test_out_of_range_page_in_view(posts, client, settings):
+    settings.POSTS_PAGINATION_MODE = "page"
+    response = client.get("/", {"page": 999})
+    assert response.status_code == 200
+    assert list(response.context["page_obj"]) == posts[20:]
@@ -0,0 +1,125 @@
+from datetime import timedelta
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+
+from blog.models import Category, Comment, Location, Post
+from blog.query_budget import get_query_budget
+
+
+@pytest.fixture(params=(10, 100, 1000), ids=lambda n: f"{n}_rows")
+def rows(request, mixer, user, another_user):
+    n = request.param
+    category = mixer.blend("blog.Category", is_published=True)
+    location = mixer.blend("blog.Location", is_published=True)
+    Category.objects.bulk_create(
+        Category(title=f"Категория {i}", description="-", slug=f"cat-{i}")
+        for i in range(n)
+    )
+    Location.objects.bulk_create(
+        Location(name=f"Место {i}") for i in range(n)
+    )
+    now = timezone.now()
+    Post.objects.bulk_create(
+        Post(
+            title=f"Пост {i}",
+            text="Текст",
+            pub_date=now - timedelta(minutes=i + 1),
+            visible_from=now - timedelta(minutes=i + 1),
+            author=user,
+            category=category,
+            location=location,
+        )
+        for i in range(n)
+    )
+    post = Post.objects.order_by("-pub_date").first()
+    Comment.objects.bulk_create(
+        Comment(post=post, author=(user, another_user)[i % 2], text="-")
+        for i in range(n)
+    )
+    comment = post.comments.filter(author=user).first()
+    post_data = {
+        "title": "Новый",
+        "text": "Текст",
+        "pub_date": "2020-01-01T10:00",
+        "category": category.id,
+        "location": location.id,
+        "is_published": "on",
+    }
+    return {
+        "category": category,
+        "post": post,
+        "comment": comment,
+        "post_data": post_data,
+    }
+
+
+def endpoints(user, rows):
+    post, comment = rows["post"], rows["comment"]
+    return (
+        ("get", "/", None),
+        ("get", f"/category/{rows['category'].slug}/", None),
+        ("get", f"/profile/{user.username}/", None),
+        ("get", f"/posts/{post.id}/", None),
+        ("get", f"/posts/{post.id}/comments/", None),
+        ("get", "/search/", {"q": "пост"}),
+        ("get", "/pages/about/", None),
+        ("get", "/pages/rules/", None),
+        ("get", "/auth/registration/", None),
+        ("get", "/profile/edit/", None),
+        ("post", "/profile/edit/", {
+            "username": user.username, "first_name": "Имя",
+            "last_name": "Фамилия", "email": "user@example.com",
+        }),
+        ("get", "/posts/create/", None),
+        ("post", "/posts/create/", rows["post_data"]),
+        ("get", f"/posts/{post.id}/edit/", None),
+        ("get", "/posts/lookup/location/", {"q": "Место"}),
+        ("post", f"/posts/{post.id}/edit/", rows["post_data"]),
+        ("post", f"/posts/{post.id}/comment/", {"text": "Комментарий"}),
+        ("get", f"/posts/{post.id}/edit_comment/{comment.id}/", None),
+        ("post", f"/posts/{post.id}/edit_comment/{comment.id}/",
+         {"text": "Изменён"}),
+        ("get", f"/posts/{post.id}/delete_comment/{comment.id}/", None),
+        ("post", f"/posts/{post.id}/delete_comment/{comment.id}/", {}),
+        ("get", f"/posts/{post.id}/delete/", None),
+        ("post", f"/posts/{post.id}/delete/", {}),
+        ("post", "/auth/logout/", {}),
+    )
+
+
+@pytest.fixture(params=("cursor", "page"), ids=lambda mode: f"{mode}_mode")
+def pagination_mode(request, settings):
+    settings.POSTS_PAGINATION_MODE = request.param
+    return request.param
+
+
+@pytest.mark.django_db
+@override_settings(QUERY_BUDGET_RAISE=False)
+def test_views_stay_within_query_budget(
+    rows, pagination_mode, user, user_client
+):
+    over_budget = []
+    for method, url, data in endpoints(user, rows):
+        budget = get_query_budget(resolve(url).func)
+        assert budget is not None, (
+            f"Для view, обслуживающего `{url}`, не задан бюджет SQL-запросов."
+        )
+        # Бюджет должен выдерживаться и при холодном кеше.
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(user_client, method)(url, data)
+        assert response.status_code < 400, f"{method.upper()} {url}"
+        if len(ctx) > budget:
+            over_budget.append(
+                f"{method.upper()} {url}: {len(ctx)} > {budget}"
+            )
+    assert not over_budget, (
+        "Убедитесь, что число SQL-запросов не зависит от объёма данных"
+        " и укладывается в бюджет view:\n" + "\n".join(over_budget)
+    )
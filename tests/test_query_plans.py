@@ -0,0 +1,77 @@
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+N_POSTS = 25
+
+
+@pytest.fixture
+def feed(mixer, user):
+    category = mixer.blend("blog.Category", is_published=True)
+    now = timezone.now()
+    posts = mixer.cycle(N_POSTS).blend(
+        "blog.Post",
+        author=user,
+        category=category,
+        is_published=True,
+        pub_date=(now - timedelta(hours=i) for i in range(1, N_POSTS + 1)),
+    )
+    mixer.cycle(5).blend("blog.Comment", post=posts[0], author=user)
+    return category, posts
+
+
+# Справочники целиком читаются в память процесса раз на версию
+# (blog.reference), а не на каждый запрос страницы.
+REFERENCE_SNAPSHOTS = tuple(
+    f'FROM "{table}" ORDER BY' for table in ("blog_category", "blog_location")
+)
+
+
+def query_plan(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def assert_plans_use_indexes(client, url):
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(url)
+    assert response.status_code == 200, url
+    for query in ctx.captured_queries:
+        sql = query["sql"]
+        if not sql.startswith("SELECT") or '"blog_' not in sql:
+            continue
+        if any(snapshot in sql for snapshot in REFERENCE_SNAPSHOTS):
+            continue
+        for step in query_plan(sql):
+            assert not step.startswith("SCAN blog_"), (
+                f"Запрос страницы `{url}` читает таблицу целиком ({step}):"
+                f"\n{sql}"
+            )
+            assert "TEMP B-TREE" not in step, (
+                f"Запрос страницы `{url}` сортирует строки во временном"
+                f" B-дереве ({step}) вместо чтения по индексу:\n{sql}"
+            )
+    return response
+
+
+@pytest.mark.django_db
+def test_feed_queries_use_indexes(feed, user):
+    category, posts = feed
+    client = Client()
+    for url in (
+        "/",
+        f"/category/{category.slug}/",
+        f"/profile/{user.username}/",
+        f"/posts/{posts[0].id}/",
+    ):
+        response = assert_plans_use_indexes(client, url)
+        next_cursor = getattr(
+            response.context.get("page_obj"), "next_cursor", None
+        )
+        if next_cursor:
+            assert_plans_use_indexes(client, f"{url}?cursor={next_cursor}")
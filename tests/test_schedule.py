@@ -0,0 +1,87 @@
+from datetime import timedelta
+from unittest import mock
+
+import pytest
+from django.core.cache import cache
+from django.test import Client
+from django.utils import timezone
+
+from blog.models import Post
+
+
+@pytest.fixture
+def clock():
+    """Подменяемое «сейчас» для django.utils.timezone.now."""
+    class Clock:
+        now = timezone.now()
+
+        def advance(self, **kwargs):
+            self.now += timedelta(**kwargs)
+
+    clock = Clock()
+    with mock.patch("django.utils.timezone.now", lambda: clock.now):
+        yield clock
+
+
+@pytest.fixture
+def categories(mixer):
+    return mixer.cycle(2).blend("blog.Category", is_published=True)
+
+
+def make_post(user, category, title, pub_date):
+    return Post.objects.create(
+        title=title, text="Текст", author=user, category=category,
+        is_published=True, pub_date=pub_date,
+    )
+
+
+@pytest.mark.django_db
+def test_scheduled_post_appears_after_its_time(clock, user, categories):
+    category = categories[0]
+    make_post(user, category, "Уже виден", clock.now - timedelta(hours=1))
+    make_post(user, category, "Отложенный", clock.now + timedelta(seconds=2))
+    client = Client()
+    for url in ("/", f"/category/{category.slug}/"):
+        assert "Отложенный" not in client.get(url).content.decode()
+    clock.advance(seconds=3)
+    for url in ("/", f"/category/{category.slug}/"):
+        assert "Отложенный" in client.get(url).content.decode(), (
+            f"Убедитесь, что отложенный пост появляется на `{url}`, когда"
+            " наступает время его публикации, несмотря на кеш страниц."
+        )
+
+
+@pytest.mark.django_db
+def test_write_after_publication_moment_does_not_lose_release(
+    clock, user, categories
+):
+    first, second = categories
+    make_post(user, first, "Уже виден", clock.now - timedelta(hours=1))
+    make_post(user, first, "Отложенный", clock.now + timedelta(seconds=2))
+    client = Client()
+    url = f"/category/{first.slug}/"
+    etag = client.get(url)["ETag"]
+    clock.advance(seconds=2.5)
+    # Запись в другой категории после момента публикации сбрасывает
+    # закешированный «следующий момент» до того, как его кто-то увидел.
+    make_post(user, second, "Другая категория", clock.now)
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200, (
+        "Убедитесь, что после наступления момента публикации страница"
+        " категории не отвечает 304 по старому ETag."
+    )
+    assert "Отложенный" in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_lost_watermark_resets_pages(clock, user, categories):
+    category = categories[0]
+    make_post(user, category, "Уже виден", clock.now - timedelta(hours=1))
+    client = Client()
+    url = f"/category/{category.slug}/"
+    etag = client.get(url)["ETag"]
+    # Как при очистке кеша или вытеснении записей.
+    cache.delete_many(
+        ["schedule:released-until", "schedule:next-publication"]
+    )
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
@@ -0,0 +1,122 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from blog.models import Post
+
+N_PER_PAGE = 10
+
+
+@pytest.fixture
+def category(mixer):
+    return mixer.blend("blog.Category", is_published=True)
+
+
+@pytest.fixture
+def make_post(user, category):
+    def make_post(title="Пост", text="Текст", **kwargs):
+        fields = {
+            "author": user,
+            "category": category,
+            "is_published": True,
+            "pub_date": timezone.now() - timedelta(hours=1),
+            **kwargs,
+        }
+        return Post.objects.create(title=title, text=text, **fields)
+    return make_post
+
+
+def found_ids(client, query, **params):
+    response = client.get("/search/", {"q": query, **params})
+    assert response.status_code == 200
+    page = response.context["page_obj"]
+    return [post.id for post in page], page
+
+
+@pytest.mark.django_db
+def test_post_created_after_migrations_is_found(client, make_post):
+    post = make_post(title="Про котика", text="Рыжий и пушистый")
+    assert found_ids(client, "котик")[0] == [post.id], (
+        "Убедитесь, что пост, созданный после миграций, находится поиском"
+        " по началу слова."
+    )
+    Post.objects.filter(pk=post.pk).update(title="Про собаку")
+    assert found_ids(client, "котик")[0] == []
+    assert found_ids(client, "собак")[0] == [post.id], (
+        "Убедитесь, что поисковый индекс обновляется при изменении поста."
+    )
+    post.delete()
+    assert found_ids(client, "собак")[0] == []
+
+
+@pytest.mark.django_db
+def test_title_match_ranks_above_text_match(client, make_post):
+    in_text = make_post(title="Заметка", text="Немного про енота в конце")
+    in_title = make_post(title="Енот", text="Заметка без зверей")
+    assert found_ids(client, "енот")[0] == [in_title.id, in_text.id], (
+        "Убедитесь, что совпадение в заголовке поднимает пост выше"
+        " совпадения только в тексте."
+    )
+
+
+@pytest.mark.django_db
+def test_snippet_is_escaped_and_highlighted(client, make_post):
+    make_post(title="Скрипт", text="<script>alert('котик')</script> текст")
+    response = client.get("/search/", {"q": "котик"})
+    content = response.content.decode()
+    assert "<script>alert" not in content, (
+        "Убедитесь, что текст поста в выдаче поиска экранируется."
+    )
+    assert "&lt;script&gt;" in content
+    assert "<mark>котик</mark>" in content
+
+
+@pytest.mark.django_db
+def test_only_visible_posts_are_found(client, mixer, make_post):
+    visible = make_post(title="Лиса видимая")
+    make_post(title="Лиса черновик", is_published=False)
+    make_post(
+        title="Лиса будущая", pub_date=timezone.now() + timedelta(days=1)
+    )
+    make_post(
+        title="Лиса в скрытой категории",
+        category=mixer.blend("blog.Category", is_published=False),
+    )
+    assert found_ids(client, "лиса")[0] == [visible.id], (
+        "Убедитесь, что поиск не показывает неопубликованные, отложенные"
+        " посты и посты скрытых категорий."
+    )
+
+
+@pytest.mark.django_db
+def test_next_and_previous_cursors(client, make_post):
+    for i in range(N_PER_PAGE + 5):
+        make_post(title=f"Ёж {i}")
+    first_ids, first = found_ids(client, "ёж")
+    assert len(first_ids) == N_PER_PAGE
+    assert first.next_cursor and not first.has_previous()
+    second_ids, second = found_ids(client, "ёж", cursor=first.next_cursor)
+    assert len(second_ids) == 5 and not set(first_ids) & set(second_ids), (
+        "Убедитесь, что следующая страница поиска продолжает выдачу"
+        " без повторов."
+    )
+    assert not second.has_next() and second.previous_cursor
+    back_ids, _ = found_ids(client, "ёж", cursor=second.previous_cursor)
+    assert back_ids == first_ids
+
+
+@pytest.mark.django_db
+def test_admin_search_uses_index(admin_client, make_post, mixer, user):
+    post = make_post(title="Барсук", text="Текст")
+    make_post(title="Другое", text="Текст")
+    response = admin_client.get("/admin/blog/post/", {"q": "барсук"})
+    assert list(response.context["cl"].result_list) == [post]
+    mixer.blend("blog.Comment", post=post, author=user)
+    response = admin_client.get("/admin/autocomplete/", {
+        "app_label": "blog", "model_name": "comment",
+        "field_name": "post", "term": "барс",
+    })
+    assert [item["id"] for item in response.json()["results"]] == [
+        str(post.id)
+    ]
@@ -0,0 +1,96 @@
+import gzip
+
+import pytest
+from django.http import Http404
+from django.test import RequestFactory
+
+from blog.staticfiles import serve
+
+CSS = b"body { color: red; }\n" * 100
+HASHED = "css/app.0123456789ab.css"
+
+
+@pytest.fixture(autouse=True)
+def static_root(settings, tmp_path):
+    settings.STATIC_ROOT = tmp_path
+    (tmp_path / "css").mkdir()
+    for name in (HASHED, "css/app.css"):
+        (tmp_path / name).write_bytes(CSS)
+    (tmp_path / (HASHED + ".gz")).write_bytes(gzip.compress(CSS))
+    (tmp_path / (HASHED + ".br")).write_bytes(b"brotli")
+    return tmp_path
+
+
+def get(path, accept_encoding=None, method="get"):
+    headers = {}
+    if accept_encoding is not None:
+        headers["HTTP_ACCEPT_ENCODING"] = accept_encoding
+    request = getattr(RequestFactory(), method)(f"/static/{path}", **headers)
+    return serve(request, path)
+
+
+def content(response):
+    return b"".join(response.streaming_content)
+
+
+@pytest.mark.parametrize("accept_encoding, encoding, suffix", (
+    ("gzip, deflate, br", "br", ".br"),
+    ("gzip, br;q=0", "gzip", ".gz"),
+    ("gzip", "gzip", ".gz"),
+))
+def test_precompressed_copy_is_chosen(
+    static_root, accept_encoding, encoding, suffix
+):
+    response = get(HASHED, accept_encoding)
+    body = (static_root / (HASHED + suffix)).read_bytes()
+    assert response["Content-Encoding"] == encoding, (
+        "Убедитесь, что отдаётся сжатая копия в принятой клиентом"
+        " кодировке."
+    )
+    assert content(response) == body
+    assert response["Content-Type"].startswith("text/css"), (
+        "Убедитесь, что тип сжатой копии совпадает с типом исходника."
+    )
+    assert response["Content-Length"] == str(len(body))
+    assert response["Vary"] == "Accept-Encoding"
+
+
+@pytest.mark.parametrize("accept_encoding", (None, "identity", "gzip;q=0"))
+def test_original_without_accepted_encoding(accept_encoding):
+    response = get(HASHED, accept_encoding)
+    assert not response.has_header("Content-Encoding")
+    assert content(response) == CSS
+    assert response["Content-Length"] == str(len(CSS))
+    assert response["Vary"] == "Accept-Encoding", (
+        "Убедитесь, что ответ без сжатия тоже зависит от"
+        " Accept-Encoding для кешей."
+    )
+
+
+def test_original_without_compressed_copy():
+    response = get("css/app.css", "gzip, br")
+    assert not response.has_header("Content-Encoding")
+    assert content(response) == CSS
+
+
+def test_only_hashed_names_are_immutable():
+    hashed = get(HASHED, "gzip")["Cache-Control"]
+    assert "immutable" in hashed and "max-age=31536000" in hashed
+    plain = get("css/app.css", "gzip")["Cache-Control"]
+    assert "immutable" not in plain, (
+        "Убедитесь, что файлы без хеша в имени не кешируются навсегда."
+    )
+    assert "max-age=3600" in plain
+
+
+@pytest.mark.parametrize("path", (
+    HASHED + ".gz", "css/missing.css", "../secret.css", "css",
+))
+def test_unknown_path_is_not_found(path):
+    with pytest.raises(Http404):
+        get(path, "gzip")
+
+
+def test_only_safe_methods():
+    assert get(HASHED, method="post").status_code == 405
+    assert get(HASHED, "gzip", method="head").status_code == 200
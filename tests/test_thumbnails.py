@@ -0,0 +1,136 @@
+import io
+import os
+from datetime import timedelta
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.template import Context, Template
+from django.utils import timezone
+from PIL import Image
+
+from blog.thumbnails import get_thumbnail, trim_thumbnails
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    settings.THUMBNAIL_ROOT = tmp_path / "thumbnails"
+    settings.THUMBNAIL_WIDTHS = (320, 640)
+    return tmp_path
+
+
+def save_image(color="red", size=(800, 600), quality=75):
+    output = io.BytesIO()
+    Image.new("RGB", size, color).save(output, "JPEG", quality=quality)
+    return default_storage.save(
+        "posts/photo.jpg", ContentFile(output.getvalue())
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("fmt, content_type, pillow_format", (
+    ("webp", "image/webp", "WEBP"),
+    ("jpeg", "image/jpeg", "JPEG"),
+))
+def test_variant_is_served(client, fmt, content_type, pillow_format):
+    name = save_image()
+    response = client.get(f"/thumbnails/320/{fmt}/{name}")
+    assert response.status_code == 200
+    assert response["Content-Type"] == content_type
+    cache_control = response["Cache-Control"]
+    assert "immutable" in cache_control and "public" in cache_control, (
+        "Убедитесь, что вариант фото отдаётся с неизменяемым общим кешем."
+    )
+    assert "max-age=31536000" in cache_control
+    content = b"".join(response.streaming_content)
+    with Image.open(io.BytesIO(content)) as image:
+        assert image.format == pillow_format
+        assert image.size == (320, 240)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("url", (
+    "/thumbnails/100/webp/{name}",
+    "/thumbnails/320/gif/{name}",
+    "/thumbnails/320/webp/{other}",
+    "/thumbnails/320/webp/posts/../../../etc/passwd",
+    "/thumbnails/320/webp/posts/missing.jpg",
+), ids=("width", "format", "prefix", "traversal", "missing"))
+def test_invalid_variant_is_not_found(client, url):
+    name = save_image()
+    other = default_storage.save("other/photo.jpg", ContentFile(b"x"))
+    assert not other.startswith("posts/")
+    url = url.format(name=name, other=other)
+    assert client.get(url).status_code == 404, (
+        "Убедитесь, что варианты отдаются только допустимых ширин и"
+        " форматов и только для фото постов."
+    )
+
+
+@pytest.mark.django_db
+def test_picture_offers_webp_with_jpeg_fallback(mixer, user):
+    name = save_image(size=(400, 300))
+    post = mixer.blend(
+        "blog.Post", author=user, image=name,
+        pub_date=timezone.now() - timedelta(days=1),
+    )
+    html = Template(
+        "{% load blog_tags %}{% post_picture post %}"
+    ).render(Context({"post": post}))
+    assert '<source type="image/webp"' in html
+    assert f"/thumbnails/320/webp/{name} 320w" in html
+    # Фото уже 640 пикселей, а варианты его не увеличивают.
+    assert f"/thumbnails/640/webp/{name} 400w" in html
+    assert f"/thumbnails/320/jpeg/{name} 320w" in html
+    assert 'width="400" height="300"' in html
+
+
+def make_variant(name, age):
+    path = get_thumbnail(name, 320, "jpeg")
+    moment = timezone.now().timestamp() - age
+    os.utime(path, (moment, moment))
+    return path
+
+
+@pytest.mark.django_db
+def test_trim_removes_least_recently_used():
+    # Хранилище адресует файлы по содержимому: фото различаются
+    # качеством сжатия, а их однотонные варианты совпадают по размеру.
+    names = [save_image(quality=quality) for quality in (70, 80, 90)]
+    old, recent, fresh = (
+        make_variant(name, age) for name, age in zip(names, (300, 200, 100))
+    )
+    size = fresh.stat().st_size
+    # Повторный запрос отмечает вариант использованным.
+    assert get_thumbnail(names[0], 320, "jpeg") == old
+    assert trim_thumbnails(size * 2) == (1, size * 2), (
+        "Убедитесь, что при превышении лимита удаляется давно не"
+        " запрошенный вариант."
+    )
+    assert old.exists() and not recent.exists() and fresh.exists()
+
+
+@pytest.mark.django_db
+def test_trim_is_amortized_over_created_variants(settings):
+    old = make_variant(save_image(quality=70), age=300)
+    size = old.stat().st_size
+    settings.THUMBNAIL_CACHE_MAX_BYTES = size
+    settings.THUMBNAIL_TRIM_EVERY = 10 ** 9
+    recent = make_variant(save_image(quality=80), age=200)
+    assert old.exists(), (
+        "Убедитесь, что кеш вариантов не обходится при каждом промахе."
+    )
+    settings.THUMBNAIL_TRIM_EVERY = 1
+    fresh = get_thumbnail(save_image(quality=90), 320, "jpeg")
+    assert fresh.exists() and not old.exists() and not recent.exists()
+
+
+@pytest.mark.django_db
+def test_trim_thumbnails_command():
+    path = make_variant(save_image(), age=300)
+    output = io.StringIO()
+    call_command("trim_thumbnails", max_bytes=0, stdout=output)
+    assert not path.exists()
+    assert output.getvalue()
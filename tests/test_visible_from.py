@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from blog.models import Post
+
+
+@pytest.fixture
+def visible_post(mixer, user):
+    category = mixer.blend("blog.Category", is_published=True)
+    return mixer.blend(
+        "blog.Post",
+        author=user,
+        category=category,
+        is_published=True,
+        pub_date=timezone.now() - timedelta(days=1),
+    )
+
+
+@pytest.mark.django_db
+def test_bulk_unpublish_hides_post(visible_post):
+    Post.objects.filter(is_published=True).update(is_published=False)
+    visible_post.refresh_from_db()
+    assert visible_post.visible_from is None, (
+        "Убедитесь, что `QuerySet.update(is_published=False)` сбрасывает"
+        " `visible_from` постов."
+    )
+    assert not Post.objects.published().exists()
+
+
+@pytest.mark.django_db
+def test_bulk_pub_date_change_moves_visible_from(visible_post):
+    pub_date = timezone.now() + timedelta(days=1)
+    Post.objects.filter(pk=visible_post.pk).update(pub_date=pub_date)
+    visible_post.refresh_from_db()
+    assert visible_post.visible_from == pub_date, (
+        "Убедитесь, что `QuerySet.update(pub_date=...)` переносит"
+        " `visible_from` на новую дату публикации."
+    )
+
+
+@pytest.mark.django_db
+def test_bulk_category_change_updates_visible_from(mixer, visible_post):
+    hidden = mixer.blend("blog.Category", is_published=False)
+    Post.objects.filter(pk=visible_post.pk).update(category=hidden)
+    visible_post.refresh_from_db()
+    assert visible_post.visible_from is None
+    Post.objects.filter(pk=visible_post.pk).update(
+        category_id=mixer.blend("blog.Category", is_published=True).pk
+    )
+    visible_post.refresh_from_db()
+    assert visible_post.visible_from == visible_post.pub_date
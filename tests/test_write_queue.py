@@ -0,0 +1,75 @@
+from datetime import timedelta
+
+import pytest
+from django.db import OperationalError
+from django.utils import timezone
+
+from blog import views
+from blog.models import Comment
+from blog.write_queue import PendingWrite, WriteTimeout, write_batch
+
+
+@pytest.fixture
+def post(mixer, user):
+    return mixer.blend(
+        "blog.Post",
+        author=user,
+        category=mixer.blend("blog.Category", is_published=True),
+        is_published=True,
+        pub_date=timezone.now() - timedelta(days=1),
+    )
+
+
+@pytest.mark.django_db
+def test_cancelled_write_is_skipped(post, user):
+    cancelled = PendingWrite(Comment(post=post, author=user, text="Поздно"))
+    kept = PendingWrite(Comment(post=post, author=user, text="Вовремя"))
+    assert cancelled.cancel()
+    write_batch([cancelled, kept])
+    assert list(Comment.objects.values_list("text", flat=True)) == [
+        "Вовремя"
+    ], (
+        "Убедитесь, что комментарий, отменённый по таймауту, писатель"
+        " не записывает."
+    )
+    assert not cancelled.done.is_set() and kept.done.is_set()
+    assert not kept.cancel(), "Взятую писателем запись отменить нельзя."
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("error", (
+    WriteTimeout("Сервер перегружен, комментарий не сохранён."),
+    OperationalError("database is locked"),
+), ids=("timeout", "database_error"))
+def test_add_comment_reports_write_errors(
+    post, user_client, monkeypatch, error
+):
+    def save_comment(comment):
+        raise error
+
+    monkeypatch.setattr(views, "save_comment", save_comment)
+    response = user_client.post(
+        f"/posts/{post.id}/comment/", {"text": "Текст"}, follow=True
+    )
+    assert response.status_code == 200, (
+        "Убедитесь, что ошибка записи комментария не приводит к ошибке"
+        " сервера."
+    )
+    assert response.redirect_chain[-1][0] == f"/posts/{post.id}/"
+    content = response.content.decode()
+    assert "alert-danger" in content and "комментарий" in content, (
+        "Убедитесь, что пользователь видит сообщение о том, что"
+        " комментарий не сохранён."
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_batched_comment_is_saved(post, user_client, settings):
+    settings.COMMENT_WRITE_BATCHING = True
+    response = user_client.post(
+        f"/posts/{post.id}/comment/", {"text": "Пачкой"}
+    )
+    assert response.status_code == 302
+    post.refresh_from_db()
+    assert post.comment_count == 1
+    assert Comment.objects.get().text == "Пачкой"